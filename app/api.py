@@ -1,16 +1,299 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from threading import Lock
+from time import monotonic, sleep
 from urllib.parse import urlencode
 
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 from rest_framework import status
+from urllib3.util.retry import Retry
 
 HEADERS = {"User-Agent": "Praeceptor/1.0 (praeceptor@praeceptor.com)"}
 
 
-class NominatimAPI:
+class APIUnavailable(Exception):
+    """Raised when a provider is not queried at all, as its circuit is open or 'GEOCODING_OFFLINE' is set.
+
+    Unlike a "Not Found" answer, the CEP may still be resolved later.
+    """
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Args:
+        rate (float): Tokens added per second, 0 for no limit.
+        capacity (float, optional): Maximum burst of tokens. Defaults to 1.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        """Take one token, blocking until it is available."""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+_session = None
+_session_lock = Lock()
+
+
+def get_session() -> requests.Session:
+    """Shared HTTP session of the geocoding clients.
+
+    Keeps a pool of keep-alive connections per host and retries idempotent requests with
+    exponential backoff, honoring the 'Retry-After' header of 429 and 503 responses.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=settings.GEOCODING_MAX_RETRIES,
+                backoff_factor=settings.GEOCODING_BACKOFF_FACTOR,
+                status_forcelist=(
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    status.HTTP_502_BAD_GATEWAY,
+                    status.HTTP_503_SERVICE_UNAVAILABLE,
+                    status.HTTP_504_GATEWAY_TIMEOUT,
+                ),
+                allowed_methods=("GET",),
+                respect_retry_after_header=True,
+                raise_on_status=False,  # Hand the last response over to the clients
+            )
+            adapter = HTTPAdapter(
+                pool_connections=settings.GEOCODING_POOL_SIZE,
+                pool_maxsize=settings.GEOCODING_POOL_SIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+
+    return _session
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker.
+
+    Opens after 'failure_threshold' consecutive failures, failing fast until 'reset_timeout' seconds
+    have passed. Then a single probe call is let through (half-open): its success closes the circuit
+    and its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = Lock()
+
+    def allow(self) -> bool:
+        """Check whether a call may go through."""
+        with self.lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+            if self.state == CircuitBreaker.OPEN and monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = CircuitBreaker.HALF_OPEN
+                return True
+            return False
+
+    def record(self, success: bool):
+        """Record the outcome of a call that went through."""
+        with self.lock:
+            if success:
+                self.state = CircuitBreaker.CLOSED
+                self.failures = 0
+                return
+
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = monotonic()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into a single execution whose result they all get."""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = Lock()
+
+    def do(self, key, fn):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+        return future.result()
+
+
+class BaseAPI(ABC):
+    """Base class for the geocoding clients.
+
+    Shares the pooled session, rate limits each endpoint, fails fast through a circuit breaker
+    while the provider is failing and coalesces concurrent lookups of the same CEP.
+    """
+
+    rate_limit_setting = None
+
+    _shared = {}
+    _shared_lock = Lock()
+    _flights = SingleFlight()
+
+    @classmethod
+    def _get_shared(cls, name: str, factory):
+        with cls._shared_lock:
+            if (cls, name) not in cls._shared:
+                cls._shared[(cls, name)] = factory()
+            return cls._shared[(cls, name)]
+
+    @classmethod
+    def get_bucket(cls) -> TokenBucket:
+        return cls._get_shared("bucket", lambda: TokenBucket(getattr(settings, cls.rate_limit_setting)))
+
+    @classmethod
+    def get_breaker(cls) -> CircuitBreaker:
+        return cls._get_shared(
+            "breaker",
+            lambda: CircuitBreaker(
+                settings.GEOCODING_CIRCUIT_FAILURE_THRESHOLD,
+                settings.GEOCODING_CIRCUIT_RESET_TIMEOUT,
+            ),
+        )
+
+    @classmethod
+    def get(cls, url: str, **kwargs) -> requests.Response:
+        """Send a GET request once the endpoint rate limit allows it."""
+        cls.get_bucket().acquire()
+        return get_session().get(url=url, timeout=settings.GEOCODING_TIMEOUT, **kwargs)
+
+    @staticmethod
+    @abstractmethod
+    def fetch(zip_code: str):
+        """Query the provider for a CEP, returning its answer or an error string."""
+
+    @staticmethod
+    @abstractmethod
+    def is_failure(result) -> bool:
+        """Check whether a fetch result is a provider failure rather than an answer."""
+
+    @classmethod
+    def guarded_fetch(cls, zip_code: str):
+        """Fetch through the circuit breaker.
+
+        Raises:
+            APIUnavailable: While the circuit is open, or when 'GEOCODING_OFFLINE' is set, so that
+                CEPs are resolved only from ZipCodeLookup.
+        """
+        if settings.GEOCODING_OFFLINE:
+            raise APIUnavailable(f"{cls.__name__} is offline.")
+
+        breaker = cls.get_breaker()
+        if not breaker.allow():
+            raise APIUnavailable(f"{cls.__name__} circuit is open.")
+
+        try:
+            result = cls.fetch(zip_code)
+        except Exception:
+            # An unexpected error is a failure too, or a half-open circuit would never close again
+            breaker.record(success=False)
+            raise
+
+        breaker.record(success=not cls.is_failure(result))
+        return result
+
+    @classmethod
+    def coalesce(cls, zip_code: str, fn):
+        """Run fn(zip_code) once for all the concurrent lookups of the same CEP."""
+        return cls._flights.do((cls, zip_code), lambda: fn(zip_code))
+
+
+class NominatimAPI(BaseAPI):
+
+    rate_limit_setting = "NOMINATIM_RATE_LIMIT"
 
     @staticmethod
     def search(zip_code: str) -> tuple:
+        """Search for latitude and longitude by zip code, checking the ZipCodeLookup cache first.
+
+        Args:
+            zip_code (str): CEP to be geocoded.
+        Returns:
+            tuple or None: Latitude and longitude as a tuple if successful, None otherwise.
+        Raises:
+            APIUnavailable: When the CEP is not cached and Nominatim cannot be queried.
+        """
+        # Imported here as the profiles models depend on this module
+        from app.profiles.models import ZipCodeLookup
+
+        if lookup := ZipCodeLookup.get_fresh(zip_code, ZipCodeLookup.SOURCE_NOMINATIM):
+            if lookup.nominatim_status == ZipCodeLookup.STATUS_NOT_FOUND:
+                return "Not Found", "Not Found"
+            return lookup.latitude, lookup.longitude
+
+        return NominatimAPI.coalesce(ZipCodeLookup.normalize(zip_code), NominatimAPI.fetch_and_store)
+
+    @staticmethod
+    def fetch_and_store(zip_code: str) -> tuple:
+        """Fetch the coordinates of a CEP from Nominatim API and store the answer in ZipCodeLookup."""
+        from app.profiles.models import ZipCodeLookup
+
+        lat, lon = NominatimAPI.guarded_fetch(zip_code)
+
+        if isinstance(lat, float) and isinstance(lon, float):
+            ZipCodeLookup.store(
+                zip_code,
+                ZipCodeLookup.SOURCE_NOMINATIM,
+                ZipCodeLookup.STATUS_FOUND,
+                latitude=lat,
+                longitude=lon,
+            )
+        elif lat == "Not Found":
+            ZipCodeLookup.store(zip_code, ZipCodeLookup.SOURCE_NOMINATIM, ZipCodeLookup.STATUS_NOT_FOUND)
+
+        return lat, lon
+
+    @staticmethod
+    def fetch(zip_code: str) -> tuple:
         """Search for latitude and longitude from Nominatim API by zip code.
 
         Args:
@@ -27,20 +310,17 @@ class NominatimAPI:
         }
 
         try:
-            response = requests.get(
-                url=url,
-                headers=HEADERS,
-                params=params,
-                timeout=5,
-            )
-        except requests.RequestException:
-            return "RequestException", "RequestException"
+            response = NominatimAPI.get(url, params=params)
         except requests.Timeout:
             return "Timeout", "Timeout"
+        except requests.RequestException:
+            return "RequestException", "RequestException"
 
         if response.status_code == status.HTTP_200_OK:
             try:
                 response = response.json()
+                if not response:
+                    return "Not Found", "Not Found"
                 lat = float(response[0].get("lat", None))
                 lon = float(response[0].get("lon", None))
                 return lat, lon
@@ -61,11 +341,59 @@ class NominatimAPI:
 
         return "Error", "Error"
 
+    @staticmethod
+    def is_failure(result) -> bool:
+        return isinstance(result[0], str) and result[0] != "Not Found"
 
-class ViaCEPAPI:
+
+class ViaCEPAPI(BaseAPI):
+
+    rate_limit_setting = "VIACEP_RATE_LIMIT"
 
     @staticmethod
     def search(zip_code: str) -> dict:
+        """Search for address data by zip code, checking the ZipCodeLookup cache first.
+
+        Args:
+            zip_code (str): CEP to be consulted.
+        Returns:
+            dict or str: Address data as a dictionary if successful, error string otherwise.
+        Raises:
+            APIUnavailable: When the CEP is not cached and ViaCEP cannot be queried.
+        """
+        # Imported here as the profiles models depend on this module
+        from app.profiles.models import ZipCodeLookup
+
+        if lookup := ZipCodeLookup.get_fresh(zip_code, ZipCodeLookup.SOURCE_VIACEP):
+            if lookup.viacep_status == ZipCodeLookup.STATUS_NOT_FOUND:
+                return "Not Found"
+            return dict(
+                street=lookup.street,
+                neighborhood=lookup.neighborhood,
+                city=lookup.city,
+                state=lookup.state,
+                region=lookup.region,
+                country=lookup.country,
+            )
+
+        return ViaCEPAPI.coalesce(ZipCodeLookup.normalize(zip_code), ViaCEPAPI.fetch_and_store)
+
+    @staticmethod
+    def fetch_and_store(zip_code: str) -> dict:
+        """Fetch the address data of a CEP from ViaCEP API and store the answer in ZipCodeLookup."""
+        from app.profiles.models import ZipCodeLookup
+
+        address_data = ViaCEPAPI.guarded_fetch(zip_code)
+
+        if isinstance(address_data, dict):
+            ZipCodeLookup.store(zip_code, ZipCodeLookup.SOURCE_VIACEP, ZipCodeLookup.STATUS_FOUND, **address_data)
+        elif address_data == "Not Found":
+            ZipCodeLookup.store(zip_code, ZipCodeLookup.SOURCE_VIACEP, ZipCodeLookup.STATUS_NOT_FOUND)
+
+        return address_data
+
+    @staticmethod
+    def fetch(zip_code: str) -> dict:
         """Search for address data from ViaCEP API by zip code.
 
         Args:
@@ -76,19 +404,18 @@ class ViaCEPAPI:
         url = f"{settings.VIACEP_ENDPOINT}/{zip_code}/json/"
 
         try:
-            response = requests.get(
-                url=url,
-                headers=HEADERS,
-                timeout=5,
-            )
-        except requests.RequestException:
-            return "RequestException"
+            response = ViaCEPAPI.get(url)
         except requests.Timeout:
             return "Timeout"
+        except requests.RequestException:
+            return "RequestException"
 
         if response.status_code == status.HTTP_200_OK:
             try:
                 response = response.json()
+                # ViaCEP answers unknown CEPs with {"erro": true}
+                if response.get("erro"):
+                    return "Not Found"
                 return dict(
                     street=response.get("logradouro"),
                     neighborhood=response.get("bairro"),
@@ -113,3 +440,7 @@ class ViaCEPAPI:
             return "Internal Server Error"
 
         return "Error"
+
+    @staticmethod
+    def is_failure(result) -> bool:
+        return isinstance(result, str) and result != "Not Found"
@@ -3,6 +3,7 @@ from django.db.models import Count
 
 from app.chat.inlines import InlineMessageAdmin, InlineThreadParticipantAdmin
 from app.chat.models import Message, Thread, ThreadParticipant
+from app.chat.search import get_message_search
 from app.chat.sections import ThreadParticipantsSection
 from app.utils import BaseAdmin
 
@@ -18,7 +19,6 @@ class ThreadAdmin(BaseAdmin):
                 "participants",
                 "participants__profile",
                 "participants__profile__user",
-                "messages",
             )
         ).annotate(
             message_count=Count(
@@ -36,6 +36,7 @@ class ThreadAdmin(BaseAdmin):
         "uuid",
         "get_message_count",
         "group",
+        "last_message_at",
     )
     list_filter = BaseAdmin.list_filter + ("group",)
     list_sections = (ThreadParticipantsSection,)
@@ -45,7 +46,10 @@ class ThreadAdmin(BaseAdmin):
         (
             "Informações",
             {
-                "fields": ("group",),
+                "fields": (
+                    "group",
+                    "last_message_at",
+                ),
             },
         ),
         (
@@ -61,7 +65,10 @@ class ThreadAdmin(BaseAdmin):
         ),
     )
     inlines = (InlineThreadParticipantAdmin, InlineMessageAdmin)
-    readonly_fields = BaseAdmin.readonly_fields + ("uuid",)
+    readonly_fields = BaseAdmin.readonly_fields + (
+        "uuid",
+        "last_message_at",
+    )
 
     # Display functions
     @admin.display(description="Mensagens")
@@ -97,6 +104,8 @@ class ThreadParticipantAdmin(BaseAdmin):
         "thread",
         "profile",
         "last_read_at",
+        "unread_count",
+        "last_activity_at",
     )
 
     # Changeform
@@ -109,6 +118,7 @@ class ThreadParticipantAdmin(BaseAdmin):
                     "thread",
                     "profile",
                     "last_read_at",
+                    "unread_count",
                 ),
             },
         ),
@@ -128,6 +138,7 @@ class ThreadParticipantAdmin(BaseAdmin):
     readonly_fields = BaseAdmin.readonly_fields + (
         "uuid",
         "last_read_at",
+        "unread_count",
     )
     autocomplete_fields = ("profile", "thread")
 
@@ -153,7 +164,7 @@ class MessageAdmin(BaseAdmin):
         "sender__user__last_name",
         "sender__user__email",
     )
-    search_help_text = "Pesquisar por UUID, nome ou e-mail."
+    search_help_text = "Pesquisar por UUID, nome, e-mail ou conteúdo."
     list_display = (
         "see_more",
         "id",
@@ -162,6 +173,15 @@ class MessageAdmin(BaseAdmin):
         "sender",
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.split():
+            # Contents are searched through the full-text index, ids only to keep the admin ordering.
+            # Matches are restricted to the incoming queryset, which holds the changelist filters
+            matches = get_message_search().search(self.model.all_objects.all(), search_term).order_by().values("id")
+            results |= queryset.filter(id__in=matches)
+        return results, may_have_duplicates
+
     # Changeform
     fieldsets = (
         (
@@ -0,0 +1,108 @@
+import asyncio
+from abc import ABC, abstractmethod
+from functools import cache
+from threading import Lock
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Events published to a set of channels, consumed from the event loop that subscribed."""
+
+    def __init__(self, broker: "BaseBroker", channels):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.CHAT_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event: dict) -> None:
+        """Queue an event, from any thread. Events to a subscription whose event loop is closed are dropped."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop closed before the subscription was closed, e.g. on a worker shutdown
+            pass
+
+    def _put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A subscriber too slow to keep up is dropped, it resumes from the sync endpoint
+            self.overflowed = True
+
+    async def get(self) -> dict | None:
+        """Next event, None once the subscription overflowed."""
+        if self.overflowed:
+            return None
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker(ABC):
+    """Base class for the pub/sub brokers delivering chat events to the streaming endpoint."""
+
+    @abstractmethod
+    def publish(self, channels, event: dict) -> None:
+        """Publish an event to the given channels.
+
+        Args:
+            channels (Iterable[str]): Channels to publish to.
+            event (dict): JSON-serializable event with 'type' and 'data' keys.
+        """
+
+    @abstractmethod
+    def subscribe(self, channels) -> Subscription:
+        """Subscribe the running event loop to the given channels."""
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop delivering events to a subscription."""
+
+
+class InMemoryBroker(BaseBroker):
+    """Broker delivering events within the current process.
+
+    Enough for a single node and for tests: with several processes or nodes, events only
+    reach the subscribers of the process where they were published.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = Lock()
+
+    def publish(self, channels, event: dict) -> None:
+        with self.lock:
+            subscriptions = {
+                subscription for channel in channels for subscription in self.subscriptions.get(channel, ())
+            }
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscribe(self, channels) -> Subscription:
+        subscription = Subscription(self, channels)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self.subscriptions.pop(channel, None)
+
+
+def profile_channel(profile_id: int) -> str:
+    return f"profile:{profile_id}"
+
+
+@cache
+def get_broker() -> BaseBroker:
+    """Return the broker configured in 'CHAT_BROKER'."""
+    return import_string(settings.CHAT_BROKER)()
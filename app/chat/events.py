@@ -0,0 +1,32 @@
+from app.chat.broker import get_broker, profile_channel
+from app.chat.models import Message, ThreadParticipant
+from app.chat.serializers import SyncMessageSerializer, SyncThreadParticipantSerializer
+
+
+def participant_channels(thread_id: int) -> list[str]:
+    """Channels of the profiles taking part in a thread."""
+    profile_ids = ThreadParticipant.objects.filter(thread_id=thread_id, deleted_at__isnull=True).values_list(
+        "profile_id", flat=True
+    )
+    return [profile_channel(profile_id) for profile_id in profile_ids]
+
+
+def publish_message(message: Message) -> None:
+    """Push a new message to the participants of its thread."""
+    publish_messages([message])
+
+
+def publish_messages(messages: list[Message]) -> None:
+    """Push new messages of a single thread to its participants, read once for the whole batch."""
+    channels = participant_channels(messages[0].thread_id)
+    broker = get_broker()
+    for message in messages:
+        broker.publish(channels, {"type": "message", "data": SyncMessageSerializer(message).data})
+
+
+def publish_read(participant: ThreadParticipant) -> None:
+    """Push a 'last_read_at' change to the participants of its thread."""
+    get_broker().publish(
+        participant_channels(participant.thread_id),
+        {"type": "read", "data": SyncThreadParticipantSerializer(participant).data},
+    )
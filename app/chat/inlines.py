@@ -13,6 +13,7 @@ class InlineThreadParticipantAdmin(TabularInline):
         "thread",
         "profile",
         "last_read_at",
+        "unread_count",
         "created_at",
         "updated_at",
         "deleted_at",
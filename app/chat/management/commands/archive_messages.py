@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.chat.models import ArchivedMessage, Message, Thread, ThreadParticipant
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the messages older than the retention window, and the messages soft deleted long ago, "
+        "from the 'message' table to the 'message_archive' table, in keyset-ordered batches. "
+        "The last message of each thread always stays in the 'message' table. The unread counters "
+        "of the threads archived from are settled to the messages left in the 'message' table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+            help=f"Archive messages created more than this many days ago. Defaults to {settings.CHAT_ARCHIVE_AFTER_DAYS}.",
+        )
+        parser.add_argument(
+            "--deleted-days",
+            type=int,
+            default=settings.CHAT_ARCHIVE_DELETED_AFTER_DAYS,
+            help=(
+                "Archive messages soft deleted more than this many days ago. "
+                f"Defaults to {settings.CHAT_ARCHIVE_DELETED_AFTER_DAYS}."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of messages moved per batch. Defaults to 1000.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cold = Q(created_at__lt=now - timedelta(days=options["days"])) | Q(
+            deleted_at__lt=now - timedelta(days=options["deleted_days"])
+        )
+        # Threads point to their last message, which is kept hot for the inbox
+        qs = Message.all_objects.filter(cold).exclude(
+            pk__in=Thread.objects.filter(last_message__isnull=False).values("last_message")
+        )
+
+        last_pk, archived = 0, 0
+        while messages := list(qs.filter(pk__gt=last_pk).order_by("pk")[: options["batch_size"]]):
+            with transaction.atomic():
+                ArchivedMessage.objects.bulk_create(
+                    [ArchivedMessage.from_message(message) for message in messages],
+                    ignore_conflicts=True,
+                )
+                Message.all_objects.filter(pk__in=[message.pk for message in messages]).delete()
+                # Archived messages are no longer counted as unread, as 'count_unread' only reads the 'message' table
+                ThreadParticipant.settle_unread_counts({message.thread_id for message in messages})
+
+            last_pk = messages[-1].pk
+            archived += len(messages)
+            self.stdout.write(f"{archived} messages archived.")
+
+        self.stdout.write(self.style.SUCCESS(f"{archived} messages archived."))
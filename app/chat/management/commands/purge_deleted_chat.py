@@ -0,0 +1,11 @@
+from app.commands import PurgeDeletedCommand
+
+
+class Command(PurgeDeletedCommand):
+    help = (
+        "Hard delete the messages, archived messages, participants and threads soft deleted longer ago "
+        "than their model's retention in 'SOFT_DELETE_RETENTION_DAYS', in small keyset-ordered batches. "
+        "Models are purged children first, so that deleting a parent rarely cascades to many rows."
+    )
+
+    app_label = "chat"
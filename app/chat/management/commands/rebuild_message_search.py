@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app.chat.search import get_message_search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of messages from the 'message' table."
+
+    def handle(self, *args, **options):
+        search = get_message_search()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Message search index rebuilt ({type(search).__name__})."))
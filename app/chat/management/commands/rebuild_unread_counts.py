@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from app.chat.models import ThreadParticipant
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the unread message counters of thread participants from the 'message' table. "
+        "Only the counters that drifted are written, in keyset-ordered batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of participants checked per batch. Defaults to 1000.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk, checked, fixed = 0, 0, 0
+
+        while pks := list(
+            ThreadParticipant.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        ):
+            unread_count = ThreadParticipant.unread_count_subquery()
+            fixed += (
+                ThreadParticipant.objects.filter(pk__in=pks)
+                .alias(expected=unread_count)
+                .exclude(unread_count=F("expected"))
+                .update(unread_count=unread_count, updated_at=timezone.now())
+            )
+
+            last_pk = pks[-1]
+            checked += len(pks)
+
+        self.stdout.write(self.style.SUCCESS(f"{fixed} of {checked} unread counters rebuilt."))
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_remove_thread_title'),
+        ('profiles', '0007_zipcodelookup_origin'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', 'updated_at'], name='message_thread__41382d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['updated_at'], name='thread_updated_60e00a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threadparticipant',
+            index=models.Index(fields=['thread', 'updated_at'], name='thread_part_thread__07450a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threadparticipant',
+            index=models.Index(fields=['profile', 'updated_at'], name='thread_part_profile_d900c7_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='mensagens não lidas'),
+        ),
+    ]
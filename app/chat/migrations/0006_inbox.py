@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-17 21:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_last_messages(apps, schema_editor):
+    Thread = apps.get_model("chat", "Thread")
+    ThreadParticipant = apps.get_model("chat", "ThreadParticipant")
+    Message = apps.get_model("chat", "Message")
+    latest = Message.objects.filter(thread=OuterRef("pk"), deleted_at__isnull=True).order_by("-created_at", "-id")
+    Thread.objects.update(
+        last_message=Subquery(latest.values("id")[:1]),
+        last_message_at=Subquery(latest.values("created_at")[:1]),
+    )
+    ThreadParticipant.objects.update(
+        last_activity_at=Coalesce(
+            Subquery(Thread.objects.filter(pk=OuterRef("thread")).values("last_message_at")[:1]),
+            F("created_at"),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_threadparticipant_unread_count'),
+        ('profiles', '0007_zipcodelookup_origin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message', verbose_name='última mensagem'),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='última mensagem em'),
+        ),
+        migrations.AddField(
+            model_name='threadparticipant',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='última atividade em'),
+        ),
+        migrations.AddIndex(
+            model_name='threadparticipant',
+            index=models.Index(fields=['profile', '-last_activity_at'], name='thread_part_profile_f6c223_idx'),
+        ),
+        migrations.RunPython(fill_last_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5("
+            "content, content='message', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        # Soft deleted messages are kept out of the index
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message "
+            "WHEN new.deleted_at IS NULL BEGIN "
+            "INSERT INTO message_fts (rowid, content) VALUES (new.id, new.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message "
+            "WHEN old.deleted_at IS NULL BEGIN "
+            "INSERT INTO message_fts (message_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+            "END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF content, deleted_at ON message BEGIN "
+            "INSERT INTO message_fts (message_fts, rowid, content) "
+            "SELECT 'delete', old.id, old.content WHERE old.deleted_at IS NULL; "
+            "INSERT INTO message_fts (rowid, content) SELECT new.id, new.content WHERE new.deleted_at IS NULL; "
+            "END"
+        )
+        schema_editor.execute(
+            "INSERT INTO message_fts (rowid, content) SELECT id, content FROM message WHERE deleted_at IS NULL"
+        )
+
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS message_content_fts_idx ON message "
+            "USING gin (to_tsvector('portuguese', content)) WHERE deleted_at IS NULL"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TRIGGER IF EXISTS message_fts_insert")
+        schema_editor.execute("DROP TRIGGER IF EXISTS message_fts_delete")
+        schema_editor.execute("DROP TRIGGER IF EXISTS message_fts_update")
+        schema_editor.execute("DROP TABLE IF EXISTS message_fts")
+
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS message_content_fts_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_inbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-17 21:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_message_search_index'),
+        ('profiles', '0007_zipcodelookup_origin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField(verbose_name='conteúdo')),
+                ('uuid', models.UUIDField(editable=False, unique=True, verbose_name='UUID')),
+                ('created_at', models.DateTimeField(verbose_name='criado em')),
+                ('updated_at', models.DateTimeField(verbose_name='atualizado em')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='deletado em')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='arquivado em')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='profiles.profile', verbose_name='remetente')),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chat.thread', verbose_name='conversa')),
+            ],
+            options={
+                'verbose_name': 'mensagem arquivada',
+                'verbose_name_plural': 'mensagens arquivadas',
+                'db_table': 'message_archive',
+                'indexes': [models.Index(fields=['thread', '-created_at'], name='message_arc_thread__407473_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_archivedmessage'),
+        ('profiles', '0008_live_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_thread__cc928c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_sender__adf9a6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='threadparticipant',
+            name='thread_part_thread__378059_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='threadparticipant',
+            name='thread_part_profile_f6c223_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['thread', '-created_at'], name='message_thread_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['sender', '-created_at'], name='message_sender_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threadparticipant',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['thread', 'profile'], name='participant_thread_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='threadparticipant',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['profile', '-last_activity_at'], name='participant_inbox_live_idx'),
+        ),
+    ]
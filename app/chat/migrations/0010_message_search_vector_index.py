@@ -0,0 +1,43 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Q
+
+
+def search_index():
+    # Same expression as 'PostgresFullTextSearch.vector', for the planner to match it
+    return GinIndex(
+        SearchVector("content", config="portuguese"),
+        condition=Q(deleted_at__isnull=True),
+        name="message_content_fts_idx",
+    )
+
+
+def recreate_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS message_content_fts_idx")
+    schema_editor.add_index(apps.get_model("chat", "Message"), search_index())
+
+
+def restore_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS message_content_fts_idx")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS message_content_fts_idx ON message "
+        "USING gin (to_tsvector('portuguese', content)) WHERE deleted_at IS NULL"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_live_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_index, restore_search_index),
+    ]
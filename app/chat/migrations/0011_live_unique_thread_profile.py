@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-17 22:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_message_search_vector_index'),
+        ('profiles', '0009_live_unique_cpf_phone'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='threadparticipant',
+            name='unique_thread_profile',
+        ),
+        migrations.RemoveIndex(
+            model_name='threadparticipant',
+            name='participant_thread_live_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='threadparticipant',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('thread', 'profile'), name='unique_thread_profile', violation_error_message='Este perfil já participa da conversa.'),
+        ),
+    ]
@@ -1,6 +1,12 @@
 import uuid
+from datetime import UTC, datetime
+from functools import partial
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from app.profiles.models import Profile
 from app.utils import SoftDeleteModel, TimestampedModel
@@ -8,6 +14,17 @@ from app.utils import SoftDeleteModel, TimestampedModel
 
 class Thread(TimestampedModel, SoftDeleteModel):
 
+    # Relations
+    last_message = models.ForeignKey(
+        "Message",
+        verbose_name="última mensagem",
+        related_name="+",
+        on_delete=models.SET_NULL,
+        editable=False,
+        blank=True,
+        null=True,
+    )
+
     # Fields
     group = models.BooleanField(
         verbose_name="grupo",
@@ -19,15 +36,45 @@ class Thread(TimestampedModel, SoftDeleteModel):
         editable=False,
         unique=True,
     )
+    last_message_at = models.DateTimeField(
+        verbose_name="última mensagem em",
+        editable=False,
+        blank=True,
+        null=True,
+    )
 
     class Meta:
         verbose_name = "conversa"
         verbose_name_plural = "conversas"
         db_table = "thread"
+        indexes = [models.Index(fields=["updated_at"])]
 
     def __str__(self):
         return str(self.uuid)
 
+    @classmethod
+    def record_message(cls, message: "Message") -> None:
+        """Point a thread to a new message, unless a newer one was already recorded."""
+        cls.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at),
+            pk=message.thread_id,
+        ).update(last_message=message, last_message_at=message.created_at, updated_at=timezone.now())
+
+    @classmethod
+    def refresh_last_message(cls, thread_id: int) -> None:
+        """Point a thread back to its latest visible message, after soft deleting or restoring one."""
+        last_message = (
+            Message.objects.filter(thread_id=thread_id, deleted_at__isnull=True)
+            .order_by("-created_at", "-id")
+            .values("id", "created_at")
+            .first()
+        ) or {"id": None, "created_at": None}
+        cls.objects.filter(pk=thread_id).update(
+            last_message_id=last_message["id"],
+            last_message_at=last_message["created_at"],
+            updated_at=timezone.now(),
+        )
+
 
 class ThreadParticipant(TimestampedModel, SoftDeleteModel):
 
@@ -57,22 +104,134 @@ class ThreadParticipant(TimestampedModel, SoftDeleteModel):
         blank=True,
         null=True,
     )
+    unread_count = models.PositiveIntegerField(
+        verbose_name="mensagens não lidas",
+        default=0,
+        editable=False,
+    )
+    last_activity_at = models.DateTimeField(
+        verbose_name="última atividade em",
+        default=timezone.now,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "participante da conversa"
         verbose_name_plural = "participantes da conversa"
         db_table = "thread_participant"
         constraints = [
+            # Unique among live participants only, so that a removed participant can be added back
             models.UniqueConstraint(
                 fields=["thread", "profile"],
+                condition=Q(deleted_at__isnull=True),
                 name="unique_thread_profile",
+                violation_error_message="Este perfil já participa da conversa.",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["thread", "updated_at"]),
+            models.Index(fields=["profile", "updated_at"]),
+            models.Index(
+                fields=["profile", "-last_activity_at"],
+                condition=Q(deleted_at__isnull=True),
+                name="participant_inbox_live_idx",
             ),
         ]
-        indexes = [models.Index(fields=["thread", "profile"])]
 
     def __str__(self):
         return f"{str(self.thread)} | {str(self.profile)}"
 
+    def save(self, *args, **kwargs):
+        last_read_at_changed = self.last_read_at != getattr(self, "_loaded_last_read_at", None)
+        if self._state.adding or last_read_at_changed:
+            # Joining a thread, or reading up to a point, may leave messages unread
+            self.unread_count = self.count_unread()
+        super().save(*args, **kwargs)
+        self._loaded_last_read_at = self.last_read_at
+
+        if last_read_at_changed:
+            # Imported here as the events depend on this module
+            from app.chat.events import publish_read
+
+            transaction.on_commit(partial(publish_read, self))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_last_read_at = instance.__dict__.get("last_read_at")
+        return instance
+
+    def count_unread(self) -> int:
+        """Count the messages sent by the other participants after 'last_read_at'."""
+        messages = Message.objects.filter(thread_id=self.thread_id, deleted_at__isnull=True).exclude(
+            sender_id=self.profile_id
+        )
+        if self.last_read_at is not None:
+            messages = messages.filter(created_at__gt=self.last_read_at)
+        return messages.count()
+
+    @staticmethod
+    def unread_count_subquery() -> Coalesce:
+        """Correlated count of the unread messages of each participant, for bulk updates."""
+        read_until = Coalesce(
+            OuterRef("last_read_at"),
+            Value(datetime.min.replace(tzinfo=UTC), output_field=models.DateTimeField()),
+        )
+        messages = (
+            Message.objects.filter(thread=OuterRef("thread"), deleted_at__isnull=True, created_at__gt=read_until)
+            .exclude(sender=OuterRef("profile"))
+            .order_by()
+            .values("thread")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(messages), 0)
+
+    @classmethod
+    def settle_unread_counts(cls, thread_ids) -> None:
+        """Recount the unread messages of the participants of some threads, writing only the drifted counters."""
+        unread_count = cls.unread_count_subquery()
+        (
+            cls.objects.filter(thread_id__in=thread_ids)
+            .alias(expected=unread_count)
+            .exclude(unread_count=F("expected"))
+            .update(unread_count=unread_count, updated_at=timezone.now())
+        )
+
+    @classmethod
+    def record_messages(cls, messages: list["Message"]) -> None:
+        """Bump the last activity of every participant and the counters of the other ones for new messages.
+
+        Args:
+            messages (list[Message]): New messages of a single thread and sender, oldest first.
+        """
+        first, last = messages[0], messages[-1]
+        cls.objects.filter(thread_id=first.thread_id, deleted_at__isnull=True).update(
+            last_activity_at=last.created_at,
+            unread_count=F("unread_count")
+            + Case(
+                When(
+                    ~Q(profile_id=first.sender_id)
+                    & (Q(last_read_at__isnull=True) | Q(last_read_at__lt=first.created_at)),
+                    then=Value(len(messages)),
+                ),
+                default=Value(0),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def add_unread(cls, message: "Message", delta: int) -> None:
+        """Add 'delta' to the counters of the participants who have not read a message yet."""
+        participants = (
+            cls.objects.filter(thread_id=message.thread_id, deleted_at__isnull=True)
+            .exclude(profile_id=message.sender_id)
+            .filter(Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.created_at))
+        )
+        if delta < 0:
+            participants = participants.filter(unread_count__gte=-delta)
+        participants.update(unread_count=F("unread_count") + delta, updated_at=timezone.now())
+
 
 class Message(TimestampedModel, SoftDeleteModel):
 
@@ -104,9 +263,180 @@ class Message(TimestampedModel, SoftDeleteModel):
         verbose_name_plural = "mensagens"
         db_table = "message"
         indexes = [
-            models.Index(fields=["thread", "-created_at"]),
-            models.Index(fields=["sender", "-created_at"]),
+            models.Index(
+                fields=["thread", "-created_at"],
+                condition=Q(deleted_at__isnull=True),
+                name="message_thread_live_idx",
+            ),
+            models.Index(
+                fields=["sender", "-created_at"],
+                condition=Q(deleted_at__isnull=True),
+                name="message_sender_live_idx",
+            ),
+            models.Index(fields=["thread", "updated_at"]),
         ]
 
     def __str__(self):
         return str(self.uuid)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        was_visible = not adding and getattr(self, "_loaded_deleted_at", None) is None
+        is_visible = self.deleted_at is None
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding and is_visible:
+                Thread.record_message(self)
+                ThreadParticipant.record_messages([self])
+            elif is_visible != was_visible:
+                # Soft deleting and restoring a message also move the unread counters
+                Thread.refresh_last_message(self.thread_id)
+                ThreadParticipant.add_unread(self, 1 if is_visible else -1)
+        self._loaded_deleted_at = self.deleted_at
+
+        if adding:
+            # Imported here as the events depend on this module
+            from app.chat.events import publish_message
+
+            transaction.on_commit(partial(publish_message, self))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_deleted_at = instance.__dict__.get("deleted_at")
+        return instance
+
+    @classmethod
+    def soft_deleted(cls, pks: list) -> None:
+        # Same as soft deleting each message through 'save', once per thread
+        thread_ids = set(cls.all_objects.filter(pk__in=pks).values_list("thread_id", flat=True))
+        for thread_id in thread_ids:
+            Thread.refresh_last_message(thread_id)
+        ThreadParticipant.settle_unread_counts(thread_ids)
+
+    @classmethod
+    def ingest(cls, thread: Thread, sender: Profile, items: list[dict]) -> tuple[list, int]:
+        """Insert a batch of messages idempotently, keyed by their client-generated UUIDs.
+
+        Messages whose UUID already exists in the thread, archived or not, are left untouched, so
+        replaying a batch is safe, even concurrently.
+
+        Args:
+            thread (Thread): Thread the messages are sent to.
+            sender (Profile): Profile sending the messages.
+            items (list[dict]): 'uuid' and 'content' of each message, oldest first.
+
+        Returns:
+            tuple[list[Message | ArchivedMessage], int]: Canonical rows of the batch, in the order
+                of the items, and the number of messages actually inserted.
+
+        Raises:
+            ValidationError: When a UUID belongs to a message of another thread or sender.
+        """
+        uuids = [item["uuid"] for item in items]
+        related = ("thread", "sender", "sender__user")
+
+        with transaction.atomic():
+            # Replays of a batch wait for each other, so that a message is only counted once
+            Thread.objects.select_for_update().filter(pk=thread.pk).first()
+
+            rows = {
+                message.uuid: message
+                for queryset in (ArchivedMessage.objects, cls.all_objects)
+                for message in queryset.select_related(*related).filter(uuid__in=uuids)
+            }
+            if foreign := [
+                str(message.uuid)
+                for message in rows.values()
+                if (message.thread_id, message.sender_id) != (thread.pk, sender.pk)
+            ]:
+                raise ValidationError({"messages": f"UUIDs already used by other messages: {', '.join(foreign)}."})
+
+            new = [item for item in items if item["uuid"] not in rows]
+            created = []
+            if new:
+                # bulk_create bypasses Message.save, so the denormalized state is updated here
+                cls.objects.bulk_create(
+                    [cls(thread=thread, sender=sender, uuid=item["uuid"], content=item["content"]) for item in new],
+                    ignore_conflicts=True,
+                )
+                created = list(
+                    cls.all_objects.select_related(*related)
+                    .filter(uuid__in=[item["uuid"] for item in new], thread=thread, sender=sender)
+                    .order_by("created_at", "pk")
+                )
+                if len(created) != len(new):
+                    # Taken meanwhile by a message of another thread, the whole batch is rolled back
+                    raise ValidationError({"messages": "Some UUIDs were used by other messages meanwhile."})
+                rows.update((message.uuid, message) for message in created)
+
+            if created:
+                Thread.record_message(created[-1])
+                ThreadParticipant.record_messages(created)
+
+                # Imported here as the events depend on this module
+                from app.chat.events import publish_messages
+
+                transaction.on_commit(partial(publish_messages, created))
+
+        return [rows[uuid] for uuid in uuids], len(created)
+
+
+class ArchivedMessage(models.Model):
+    """Cold history of messages, moved out of the 'message' table by the 'archive_messages' command.
+
+    Rows keep the ID, UUID and timestamps they had in the 'message' table, so hot and archived
+    messages share a single keyset order.
+    """
+
+    # Fields
+    id = models.BigIntegerField(primary_key=True)
+
+    # Relations
+    thread = models.ForeignKey(
+        Thread,
+        verbose_name="conversa",
+        related_name="archived_messages",
+        on_delete=models.CASCADE,
+    )
+    sender = models.ForeignKey(
+        Profile,
+        verbose_name="remetente",
+        related_name="archived_messages",
+        on_delete=models.CASCADE,
+    )
+
+    # Fields
+    content = models.TextField(verbose_name="conteúdo")
+    uuid = models.UUIDField(
+        verbose_name="UUID",
+        editable=False,
+        unique=True,
+    )
+    created_at = models.DateTimeField(verbose_name="criado em")
+    updated_at = models.DateTimeField(verbose_name="atualizado em")
+    deleted_at = models.DateTimeField(verbose_name="deletado em", blank=True, null=True)
+    archived_at = models.DateTimeField(verbose_name="arquivado em", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "mensagem arquivada"
+        verbose_name_plural = "mensagens arquivadas"
+        db_table = "message_archive"
+        indexes = [models.Index(fields=["thread", "-created_at"])]
+
+    def __str__(self):
+        return str(self.uuid)
+
+    @classmethod
+    def from_message(cls, message: Message) -> "ArchivedMessage":
+        return cls(
+            id=message.pk,
+            thread_id=message.thread_id,
+            sender_id=message.sender_id,
+            content=message.content,
+            uuid=message.uuid,
+            created_at=message.created_at,
+            updated_at=message.updated_at,
+            deleted_at=message.deleted_at,
+        )
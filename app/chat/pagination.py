@@ -0,0 +1,239 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination, coreapi, coreschema
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class MessageKeysetPagination(BasePagination):
+    """Keyset pagination of messages, newest first, anchored on message UUIDs.
+
+    Pages are read with a range over '(created_at, id)' on the '(thread, -created_at)' index
+    instead of OFFSET and COUNT(*), so every page costs the same at any depth. The page can be
+    anchored with one of the following query params:
+
+    - before: messages older than the given message (loading older history).
+    - after: messages newer than the given message (catching up).
+    - around: the given message with the messages around it (jumping to a message).
+
+    Without an anchor, the newest messages are returned. 'next' points to older messages and
+    'previous' to newer ones.
+
+    Archived messages, from the queryset given as 'archive' or returned by the view's
+    'get_archive_queryset', are merged with the messages of the 'message' table by '(created_at, id)'.
+    Once the first tier read fills the page, the other one is only read within the range the page
+    covers, a single index range that is empty unless the tiers interleave.
+    """
+
+    page_size = settings.LIST_PER_PAGE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    anchor_query_params = ("before", "after", "around")
+    # Read from the messages of the page, on top of the serialized fields
+    required_fields = ("uuid", "created_at")
+
+    def paginate_queryset(self, queryset, request, view=None, archive=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        if archive is None and hasattr(view, "get_archive_queryset"):
+            archive = view.get_archive_queryset()
+        tiers = [queryset] if archive is None else [queryset, archive]
+
+        anchor_param, anchor, anchor_tier = self.get_anchor(tiers, request)
+        # Newer than an archived anchor is mostly the rest of the archive, read first
+        newer_tiers = tiers[::-1] if anchor_tier else tiers
+
+        older = newer = KeysetSlice([], more=False)
+        if anchor_param in (None, "before"):
+            older = self.fetch(tiers, self.older_than(anchor), self.page_size, newest_first=True)
+        elif anchor_param == "after":
+            newer = self.fetch(newer_tiers, self.newer_than(anchor), self.page_size, newest_first=False)
+        else:
+            # Half of the page on each side of the anchor, which is included in the page
+            newer = self.fetch(newer_tiers, self.newer_than(anchor), (self.page_size - 1) // 2, newest_first=False)
+            older = self.fetch(
+                tiers,
+                self.older_than(anchor, inclusive=True),
+                self.page_size - len(newer),
+                newest_first=True,
+            )
+
+        # The anchor itself lies beyond the page for 'before' and 'after'
+        self.has_older = older.more or anchor_param == "after"
+        self.has_newer = newer.more or anchor_param == "before"
+
+        self.page = list(reversed(newer)) + list(older)
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_anchor(self, tiers: list, request) -> tuple:
+        """Anchor query param, message and tier index of the page, (None, None, 0) without an anchor."""
+        params = [param for param in self.anchor_query_params if request.query_params.get(param)]
+        if not params:
+            return None, None, 0
+        if len(params) > 1:
+            raise ValidationError({"detail": f"Use only one of {', '.join(self.anchor_query_params)}."})
+
+        param = params[0]
+        for tier, queryset in enumerate(tiers):
+            try:
+                anchor = queryset.filter(uuid=request.query_params[param]).values("id", "created_at").first()
+            except DjangoValidationError:
+                raise ValidationError({param: "Invalid message UUID."})
+            if anchor is not None:
+                return param, anchor, tier
+        raise NotFound(f"Message '{request.query_params[param]}' not found.")
+
+    @staticmethod
+    def older_than(anchor: dict | None, inclusive: bool = False) -> Q:
+        if anchor is None:
+            return Q()
+        tie = Q(id__lte=anchor["id"]) if inclusive else Q(id__lt=anchor["id"])
+        # The redundant upper bound lets the database read a single range of the index
+        return Q(created_at__lte=anchor["created_at"]) & (
+            Q(created_at__lt=anchor["created_at"]) | (Q(created_at=anchor["created_at"]) & tie)
+        )
+
+    @staticmethod
+    def newer_than(anchor: dict) -> Q:
+        return Q(created_at__gte=anchor["created_at"]) & (
+            Q(created_at__gt=anchor["created_at"]) | Q(created_at=anchor["created_at"], id__gt=anchor["id"])
+        )
+
+    @classmethod
+    def fetch(cls, tiers: list, condition: Q, size: int, newest_first: bool) -> "KeysetSlice":
+        """Fetch the first 'size' rows of the tiers merged together, reading one extra row to know
+        whether there are more.
+        """
+        ordering = ("-created_at", "-id") if newest_first else ("created_at", "id")
+        rows = []
+        for queryset in tiers:
+            bound = Q()
+            if len(rows) > size:
+                # Only the rows before the extra one can still make it into the page
+                extra = {"id": rows[size].pk, "created_at": rows[size].created_at}
+                bound = cls.newer_than(extra) if newest_first else cls.older_than(extra)
+            rows += queryset.filter(condition & bound).order_by(*ordering)[: size + 1]
+            rows.sort(key=lambda row: (row.created_at, row.pk), reverse=newest_first)
+            del rows[size + 1 :]
+
+        return KeysetSlice(rows[:size], more=len(rows) > size)
+
+    def get_next_link(self) -> str | None:
+        if not self.has_older or not self.page:
+            return None
+        return self.build_link("before", self.page[-1].uuid)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_newer or not self.page:
+            return None
+        return self.build_link("after", self.page[0].uuid)
+
+    def build_link(self, param: str, uuid) -> str:
+        url = self.base_url
+        for anchor_param in self.anchor_query_params:
+            url = remove_query_param(url, anchor_param)
+        return replace_query_param(url, param, str(uuid))
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, "coreapi must be installed to use `get_schema_fields()`"
+        assert coreschema is not None, "coreschema must be installed to use `get_schema_fields()`"
+        fields = [
+            coreapi.Field(
+                name=param,
+                required=False,
+                location="query",
+                schema=coreschema.String(title=param.capitalize(), description=description),
+            )
+            for param, description in self.get_anchor_descriptions()
+        ]
+        fields.append(
+            coreapi.Field(
+                name=self.page_size_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.Integer(title="Page size", description="Number of results to return per page."),
+            )
+        )
+        return fields
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                "name": param,
+                "required": False,
+                "in": "query",
+                "description": description,
+                "schema": {"type": "string", "format": "uuid"},
+            }
+            for param, description in self.get_anchor_descriptions()
+        ]
+        parameters.append(
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            }
+        )
+        return parameters
+
+    @staticmethod
+    def get_anchor_descriptions() -> tuple:
+        return (
+            ("before", "UUID of a message, returns the messages older than it."),
+            ("after", "UUID of a message, returns the messages newer than it."),
+            ("around", "UUID of a message, returns it with the messages around it."),
+        )
+
+
+class KeysetSlice(list):
+    """Rows of one side of a keyset page, flagged with whether more rows follow them."""
+
+    def __init__(self, rows, more: bool):
+        super().__init__(rows)
+        self.more = more
+
+
+class InboxPagination(CursorPagination):
+    """Cursor pagination of a profile's threads, most recent activity first."""
+
+    page_size = settings.LIST_PER_PAGE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "-last_activity_at"
+
+    def get_ordering(self, request, queryset, view):
+        # The ordering filter of the view would otherwise replace the indexed order
+        return (self.ordering,)
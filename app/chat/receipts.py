@@ -0,0 +1,115 @@
+import atexit
+from datetime import datetime
+from functools import cache, partial
+from threading import Lock, Timer
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from app.chat.models import ThreadParticipant
+
+
+class ReadReceiptBuffer:
+    """Write-behind buffer of 'last_read_at' updates.
+
+    Read receipts are acknowledged right away and kept in memory, only the latest per
+    participant. They are written every CHAT_READ_RECEIPTS_FLUSH_SECONDS, or as soon as
+    CHAT_READ_RECEIPTS_BATCH_SIZE participants are pending, with one bulk UPDATE per batch
+    that only ever moves 'last_read_at' forward. Receipts still pending when a process
+    crashes are lost, the next receipt of the participant catches up.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = Lock()
+        self.timer = None
+
+    def add(self, participant_id: int, read_at: datetime) -> None:
+        """Buffer a read receipt of a participant."""
+        with self.lock:
+            current = self.pending.get(participant_id)
+            if current is None or read_at > current:
+                self.pending[participant_id] = read_at
+
+            if len(self.pending) >= settings.CHAT_READ_RECEIPTS_BATCH_SIZE:
+                self.schedule(0)
+            elif self.timer is None:
+                self.schedule(settings.CHAT_READ_RECEIPTS_FLUSH_SECONDS)
+
+    def schedule(self, delay: float) -> None:
+        # Called with the lock held, an earlier flush only ever replaces a later one
+        if self.timer is not None:
+            if delay > 0:
+                return
+            self.timer.cancel()
+        self.timer = Timer(delay, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def flush(self) -> int:
+        """Write every pending read receipt.
+
+        Returns:
+            int: Number of participants whose 'last_read_at' moved forward.
+        """
+        with self.lock:
+            pending, self.pending, self.timer = self.pending, {}, None
+
+        items = list(pending.items())
+        batch_size = settings.CHAT_READ_RECEIPTS_BATCH_SIZE
+        written = 0
+        try:
+            while items:
+                written += self.write(dict(items[:batch_size]))
+                items = items[batch_size:]
+        except Exception:
+            # Receipts not written yet go back to the buffer for the next flush
+            for participant_id, read_at in items:
+                self.add(participant_id, read_at)
+            raise
+        finally:
+            # Flushes run in timer threads holding their own database connections
+            close_old_connections()
+        return written
+
+    @staticmethod
+    def write(batch: dict) -> int:
+        """Write a batch of read receipts with one UPDATE, then recount their unread messages."""
+        read_at = Case(
+            *(When(pk=participant_id, then=Value(value)) for participant_id, value in batch.items()),
+            output_field=ThreadParticipant._meta.get_field("last_read_at"),
+        )
+        with transaction.atomic():
+            moved = ThreadParticipant.objects.filter(
+                Q(last_read_at__isnull=True) | Q(last_read_at__lt=read_at),
+                pk__in=batch,
+            ).update(last_read_at=read_at, updated_at=timezone.now())
+            if not moved:
+                return 0
+
+            # The counters are recounted once the new 'last_read_at' values are in place
+            ThreadParticipant.objects.filter(pk__in=batch).update(unread_count=ThreadParticipant.unread_count_subquery())
+
+            # Imported here as the events depend on the models
+            from app.chat.events import publish_read
+
+            participants = ThreadParticipant.objects.select_related(
+                "thread",
+                "profile",
+                "profile__user",
+            ).filter(pk__in=batch)
+            for participant in participants:
+                if participant.last_read_at == batch[participant.pk]:
+                    transaction.on_commit(partial(publish_read, participant))
+
+        return moved
+
+
+@cache
+def get_read_receipts() -> ReadReceiptBuffer:
+    """Return the read receipt buffer of the current process, flushed on exit."""
+    buffer = ReadReceiptBuffer()
+    atexit.register(buffer.flush)
+    return buffer
@@ -0,0 +1,139 @@
+from functools import cache
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+class BaseMessageSearch:
+    """Base class for full-text search backends over 'message.content'.
+
+    A backend narrows a Message queryset down to the messages matching a query and annotates
+    them with a 'rank', higher for better matches. Soft deleted messages are never matched.
+    """
+
+    def search(self, qs, query: str):
+        """Filter a Message queryset by a full-text query, best matches first.
+
+        Args:
+            qs (models.QuerySet["Message"]): Base queryset to search in.
+            query (str): Words to search for, all of them must match.
+
+        Returns:
+            models.QuerySet["Message"]: Matching messages annotated with 'rank', ordered by it.
+        """
+        qs = qs.filter(deleted_at__isnull=True)
+        for word in query.split():
+            qs = qs.filter(content__icontains=word)
+        return qs.annotate(rank=Value(1.0, output_field=FloatField())).order_by("-created_at")
+
+    def rebuild(self) -> None:
+        """Rebuild the whole index from the 'message' table."""
+
+
+class ContainsSearch(BaseMessageSearch):
+    """Fallback backend with unindexed 'icontains' filters, ranking by recency."""
+
+
+class FTS5Rank(Func):
+    """Relevance of a row of an FTS5 table for a match expression, higher for better matches.
+
+    Args:
+        table (str): Name of the FTS5 table.
+        rowid (Expression): Row ID of the table, usually the primary key of its content table.
+        match (str): FTS5 match expression.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, table: str, rowid, match: str):
+        self.table = table
+        super().__init__(rowid, Value(match))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        rowid, match = self.get_source_expressions()
+        rowid_sql, rowid_params = compiler.compile(rowid)
+        match_sql, match_params = compiler.compile(match)
+        sql = (
+            f"(SELECT -bm25({self.table}) FROM {self.table} "
+            f"WHERE {self.table} MATCH {match_sql} AND rowid = {rowid_sql})"
+        )
+        return sql, (*match_params, *rowid_params)
+
+
+class SQLiteFTS5Search(BaseMessageSearch):
+    """SQLite backend using the 'message_fts' FTS5 external content table.
+
+    The table is kept in sync by triggers on the 'message' table, on insert, edit, soft delete
+    and delete. Results are ranked with bm25.
+    """
+
+    table = "message_fts"
+
+    @staticmethod
+    def match_expression(query: str) -> str:
+        # Every word is quoted so that the FTS5 query syntax never applies to user input
+        return " ".join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+    def search(self, qs, query: str):
+        match = self.match_expression(query)
+        return (
+            qs.filter(
+                deleted_at__isnull=True,
+                id__in=RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", (match,)),
+            )
+            .annotate(rank=FTS5Rank(self.table, F("id"), match))
+            .order_by("-rank", "-created_at")
+        )
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('delete-all')")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, content) SELECT id, content FROM message WHERE deleted_at IS NULL"
+            )
+
+
+class PostgresFullTextSearch(BaseMessageSearch):
+    """PostgreSQL backend using the 'message_content_fts_idx' GIN index on the 'content' search vector.
+
+    The index is a partial expression index over the messages not soft deleted, so PostgreSQL
+    keeps it in sync by itself. Results are ranked with ts_rank.
+    """
+
+    config = "portuguese"
+
+    @classmethod
+    def vector(cls) -> SearchVector:
+        # The expression must match the one of the index for the index to be used
+        return SearchVector("content", config=cls.config)
+
+    def search(self, qs, query: str):
+        vector = self.vector()
+        tsquery = SearchQuery(query, config=self.config, search_type="plain")
+        return (
+            qs.alias(search_vector=vector)
+            .filter(search_vector=tsquery, deleted_at__isnull=True)
+            .annotate(rank=SearchRank(vector, tsquery))
+            .order_by("-rank", "-created_at")
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteFTS5Search,
+    "postgresql": PostgresFullTextSearch,
+}
+
+
+@cache
+def get_message_search() -> BaseMessageSearch:
+    """Return the message search backend configured in 'MESSAGE_SEARCH_BACKEND'.
+
+    Falls back to the backend matching the database vendor when the setting is empty.
+    """
+    if settings.MESSAGE_SEARCH_BACKEND:
+        return import_string(settings.MESSAGE_SEARCH_BACKEND)()
+    return BACKENDS.get(connection.vendor, ContainsSearch)()
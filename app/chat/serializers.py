@@ -1,6 +1,13 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
 
 from app.chat.models import Message, Thread, ThreadParticipant
+from app.profiles.models import Profile
 from app.profiles.serializers import SimpleProfileSerializer
 
 
@@ -30,11 +37,162 @@ class MessageSerializer(serializers.ModelSerializer):
         )
 
 
+class BulkMessageItemSerializer(serializers.Serializer):
+    uuid = serializers.UUIDField()
+    content = serializers.CharField()
+
+
+class BulkMessageSerializer(serializers.Serializer):
+    thread = serializers.SlugRelatedField(slug_field="uuid", queryset=Thread.objects.all())
+    sender = serializers.PrimaryKeyRelatedField(queryset=Profile.objects.all())
+    messages = BulkMessageItemSerializer(many=True, allow_empty=False, max_length=settings.CHAT_BULK_MESSAGES_MAX)
+
+    def validate_messages(self, value):
+        if len({item["uuid"] for item in value}) != len(value):
+            raise serializers.ValidationError("Message UUIDs must be unique within a batch.")
+        return value
+
+    def validate(self, attrs):
+        if not ThreadParticipant.objects.filter(
+            thread=attrs["thread"],
+            profile=attrs["sender"],
+            deleted_at__isnull=True,
+        ).exists():
+            raise serializers.ValidationError({"sender": "The sender is not a participant of the thread."})
+        return attrs
+
+
 class ThreadSerializer(serializers.ModelSerializer):
 
     participants = ThreadParticipantSerializer(many=True, read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
+    # Kept under its former name for API clients, it only holds the latest messages now.
+    # The full history is paged by the thread messages endpoint
+    messages = MessageSerializer(source="latest_messages", many=True, read_only=True)
+    message_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Thread
+        exclude = (
+            "id",
+            "last_message",
+        )
+
+
+# Inbox
+class InboxThreadSerializer(serializers.ModelSerializer):
+
+    last_message = MessageSerializer(many=False, read_only=True)
+
+    class Meta:
+        model = Thread
+        fields = (
+            "uuid",
+            "group",
+            "last_message",
+            "last_message_at",
+        )
+
+
+class InboxEntrySerializer(serializers.ModelSerializer):
+
+    thread = InboxThreadSerializer(many=False, read_only=True)
+
+    class Meta:
+        model = ThreadParticipant
+        fields = (
+            "uuid",
+            "thread",
+            "last_read_at",
+            "unread_count",
+            "last_activity_at",
+        )
+
+
+class InboxSerializer(serializers.Serializer):
+    profile = serializers.PrimaryKeyRelatedField(queryset=Profile.objects.all())
+
+
+# Read receipts
+class ReadReceiptSerializer(serializers.Serializer):
+    last_read_at = serializers.DateTimeField(required=False)
+
+
+# Delta sync
+class SyncThreadSerializer(serializers.ModelSerializer):
+
+    last_message = serializers.SlugRelatedField(slug_field="uuid", read_only=True)
 
     class Meta:
         model = Thread
         exclude = ("id",)
+
+
+class SyncThreadParticipantSerializer(ThreadParticipantSerializer):
+
+    thread = serializers.SlugRelatedField(slug_field="uuid", read_only=True)
+
+    class Meta:
+        model = ThreadParticipant
+        exclude = ("id",)
+
+
+class SyncMessageSerializer(MessageSerializer):
+
+    thread = serializers.SlugRelatedField(slug_field="uuid", read_only=True)
+
+    class Meta:
+        model = Message
+        exclude = ("id",)
+
+
+class SyncWatermarkField(serializers.Field):
+    """Position of a sync client in each kind of row, as an opaque string.
+
+    The internal value maps 'threads', 'participants' and 'messages' to the (updated_at, id) of the
+    last row the client received. A plain datetime is accepted too and resumes every kind from it.
+    """
+
+    kinds = ("threads", "participants", "messages")
+    default_error_messages = {"invalid": "Invalid watermark."}
+
+    def to_representation(self, value: dict) -> str:
+        positions = {kind: [updated_at.isoformat(), pk] for kind, (updated_at, pk) in value.items()}
+        return urlsafe_b64encode(json.dumps(positions, separators=(",", ":")).encode()).decode()
+
+    def to_internal_value(self, data) -> dict:
+        if isinstance(data, str) and (since := parse_datetime(data)) is not None:
+            return dict.fromkeys(self.kinds, (self.enforce_timezone(since), 0))
+
+        try:
+            positions = json.loads(urlsafe_b64decode(data.encode()))
+            return {
+                kind: (self.enforce_timezone(datetime.fromisoformat(positions[kind][0])), int(positions[kind][1]))
+                for kind in self.kinds
+            }
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+            self.fail("invalid")
+
+    def enforce_timezone(self, value: datetime) -> datetime:
+        return serializers.DateTimeField().enforce_timezone(value)
+
+
+class SyncSerializer(serializers.Serializer):
+    profile = serializers.PrimaryKeyRelatedField(queryset=Profile.objects.all())
+    since = SyncWatermarkField(required=False)
+
+
+# Full-text search
+class SearchMessageResultSerializer(SyncMessageSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+
+class SearchMessageSerializer(serializers.Serializer):
+    q = serializers.CharField()
+    thread = serializers.SlugRelatedField(slug_field="uuid", queryset=Thread.objects.all(), required=False)
+    profile = serializers.PrimaryKeyRelatedField(queryset=Profile.objects.all(), required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate_q(self, value):
+        if not value.split():
+            raise serializers.ValidationError("The query must have at least one word.")
+        return value
@@ -1,3 +1,416 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from app.chat.models import ArchivedMessage, Message, Thread, ThreadParticipant
+from app.chat.receipts import ReadReceiptBuffer
+from app.chat.serializers import MessageSerializer, ThreadSerializer
+from app.chat.views import MessageViewSet, ThreadViewSet
+from app.profiles.models import Profile
+from app.serializers import CompiledSerializer
+
+
+def create_profiles(count: int) -> list[Profile]:
+    users = User.objects.bulk_create([User(username=f"user{i}", first_name=f"Nome {i}") for i in range(count)])
+    return Profile.objects.bulk_create(
+        [
+            Profile(
+                user=user,
+                type=Profile.TYPE_CLIENT,
+                cpf=f"{i:011d}",
+                phone=f"2199999999{i}",
+                birthdate=date(2000, 1, 1),
+            )
+            for i, user in enumerate(users)
+        ]
+    )
+
+
+class CompiledChatSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        profiles = create_profiles(2)
+        # The last thread has no messages, the first one more than the latest messages embedded
+        cls.threads = Thread.objects.bulk_create([Thread(group=bool(i % 2)) for i in range(3)])
+        ThreadParticipant.objects.bulk_create(
+            [ThreadParticipant(thread=thread, profile=profile) for thread in cls.threads for profile in profiles]
+        )
+        for thread, count in zip(cls.threads, (25, 3, 0)):
+            for i in range(count):
+                Message.objects.create(thread=thread, sender=profiles[i % 2], content=f"Mensagem {i}")
+        Message.objects.filter(content="Mensagem 1").soft_delete()
+
+        # The oldest messages of the first thread are archived
+        archived = list(Message.objects.filter(thread=cls.threads[0]).order_by("created_at")[:2])
+        ArchivedMessage.objects.bulk_create([ArchivedMessage.from_message(message) for message in archived])
+        Message.objects.filter(pk__in=[message.pk for message in archived]).delete()
+
+    def render(self, data) -> bytes:
+        return JSONRenderer().render(data)
+
+    def test_thread_serializer(self):
+        queryset = ThreadViewSet.queryset.order_by("pk")
+        compiled = CompiledSerializer(ThreadSerializer(), queryset)
+        expected = self.render(ThreadSerializer(queryset, many=True).data)
+        self.assertEqual(self.render(list(compiled.serialize(compiled.rows(queryset)))), expected)
+
+    def test_message_serializer(self):
+        queryset = MessageViewSet.queryset.order_by("pk")
+        compiled = CompiledSerializer(MessageSerializer(), queryset)
+        expected = self.render(MessageSerializer(queryset, many=True).data)
+        self.assertEqual(self.render(list(compiled.serialize(compiled.rows(queryset)))), expected)
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_list_endpoints(self):
+        anchor = self.threads[0].messages.order_by("created_at")[10].uuid
+        for view, path in (
+            (ThreadViewSet, "/api/threads/"),
+            (MessageViewSet, "/api/messages/"),
+            (MessageViewSet, f"/api/messages/?page_size=5&around={anchor}"),
+        ):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                with mock.patch.object(view, "compile_list_serializer", False):
+                    expected = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_sparse_fieldset_query(self):
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled), mock.patch.object(ThreadViewSet, "compile_list_serializer", compiled):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get("/api/threads/", {"fields": "uuid"})
+                self.assertEqual(set(response.json()["results"][0]), {"uuid"})
+                # Neither the prefetches nor the 'message_count' subquery are read
+                self.assertEqual(len(queries), 2)
+                self.assertNotIn('"message"', queries[1]["sql"])
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_sparse_fieldset_expand(self):
+        params = {"fields": "uuid,messages.content", "expand": "messages.sender"}
+        responses = {}
+        for compiled in (True, False):
+            with mock.patch.object(ThreadViewSet, "compile_list_serializer", compiled):
+                with CaptureQueriesContext(connection) as queries:
+                    responses[compiled] = self.client.get("/api/threads/", params)
+            self.assertFalse([query for query in queries if '"thread_participant"' in query["sql"]])
+        self.assertEqual(responses[True].content, responses[False].content)
+
+        thread = next(thread for thread in responses[True].json()["results"] if thread["messages"])
+        self.assertEqual(set(thread), {"uuid", "messages"})
+        self.assertEqual(set(thread["messages"][0]), {"content", "sender"})
+        # Listed in 'expand' without subfields, the sender is kept whole
+        self.assertEqual(set(thread["messages"][0]["sender"]), {"user", "phone", "type"})
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_sparse_fieldset_retrieve(self):
+        thread = self.threads[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/threads/{thread.uuid}/", {"fields": "uuid,message_count"})
+        self.assertEqual(
+            response.json(),
+            {"uuid": str(thread.uuid), "message_count": 24},
+        )
+
+
+class ThreadParticipantTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profiles = create_profiles(2)
+        cls.thread = Thread.objects.create()
+
+    def test_readd(self):
+        removed = ThreadParticipant.objects.create(thread=self.thread, profile=self.profiles[0])
+        removed.delete()
+
+        participant = ThreadParticipant(thread=self.thread, profile=self.profiles[0])
+        participant.full_clean()
+        participant.save()
+        self.assertNotEqual(participant.pk, removed.pk)
+
+        duplicate = ThreadParticipant(thread=self.thread, profile=self.profiles[0])
+        with self.assertRaises(ValidationError):
+            duplicate.full_clean()
+
+    def test_counters(self):
+        participants = [
+            ThreadParticipant.objects.create(thread=self.thread, profile=profile) for profile in self.profiles
+        ]
+        messages = [
+            Message.objects.create(thread=self.thread, sender=self.profiles[0], content=f"Mensagem {i}")
+            for i in range(3)
+        ]
+
+        def assertUnread(counts):
+            for participant in participants:
+                participant.refresh_from_db()
+                self.assertEqual(participant.unread_count, participant.count_unread())
+            self.assertEqual([participant.unread_count for participant in participants], counts)
+
+        # Sent
+        assertUnread([0, 3])
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_id, messages[-1].pk)
+
+        # Read up to the second message
+        participants[1].last_read_at = messages[1].created_at
+        participants[1].save()
+        assertUnread([0, 1])
+
+        # Deleting a read message leaves the counter alone, deleting an unread one decrements it
+        messages[0].delete()
+        assertUnread([0, 1])
+        messages[2].delete()
+        assertUnread([0, 0])
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_id, messages[1].pk)
+
+        # Restored
+        messages[2].deleted_at = None
+        messages[2].save()
+        assertUnread([0, 1])
+
+    def test_soft_delete_counters(self):
+        participants = [
+            ThreadParticipant.objects.create(thread=self.thread, profile=profile) for profile in self.profiles
+        ]
+        messages = [
+            Message.objects.create(thread=self.thread, sender=self.profiles[i % 2], content=f"Mensagem {i}")
+            for i in range(5)
+        ]
+
+        self.assertEqual(Message.objects.filter(pk__in=[messages[2].pk, messages[4].pk]).soft_delete(), 2)
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.last_message_id, messages[3].pk)
+        for participant in participants:
+            participant.refresh_from_db()
+            self.assertEqual(participant.unread_count, participant.count_unread())
+        self.assertEqual([participant.unread_count for participant in participants], [2, 1])
+
+    def test_join_counter(self):
+        for i in range(3):
+            Message.objects.create(thread=self.thread, sender=self.profiles[1], content=f"Mensagem {i}")
+
+        participant = ThreadParticipant.objects.create(thread=self.thread, profile=self.profiles[0])
+        self.assertEqual(participant.unread_count, 3)
+        participant.refresh_from_db()
+        self.assertEqual(participant.unread_count, participant.count_unread())
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class MessageKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        profiles = create_profiles(2)
+        cls.thread = Thread.objects.create()
+        messages = [
+            Message.objects.create(thread=cls.thread, sender=profiles[i % 2], content=f"Mensagem {i}")
+            for i in range(13)
+        ]
+        # Messages sent in the same instant share their 'created_at', three by three
+        base = timezone.now() - timedelta(days=1)
+        for i, message in enumerate(messages):
+            Message.objects.filter(pk=message.pk).update(created_at=base + timedelta(seconds=i // 3))
+        messages = Message.objects.filter(thread=cls.thread)
+
+        # The oldest messages are archived, the pages cross both tiers
+        archived = list(messages.order_by("created_at", "id")[:4])
+        ArchivedMessage.objects.bulk_create([ArchivedMessage.from_message(message) for message in archived])
+        Message.objects.filter(pk__in=[message.pk for message in archived]).delete()
+
+        cls.expected = [str(message.uuid) for message in sorted(archived, key=lambda m: (m.created_at, m.pk))] + [
+            str(uuid) for uuid in messages.order_by("created_at", "id").values_list("uuid", flat=True)
+        ]
+        cls.expected.reverse()
+        cls.url = f"/api/threads/{cls.thread.uuid}/messages/"
+
+    def walk(self, url: str, link: str) -> list[list[str]]:
+        """UUIDs of each page, following the given link from the first page until the last one."""
+        pages = []
+        while url:
+            response = self.client.get(url).json()
+            pages.append([message["uuid"] for message in response["results"]])
+            url = response[link]
+        return pages
+
+    def test_round_trip(self):
+        older = self.walk(f"{self.url}?page_size=4", "next")
+        self.assertEqual([uuid for page in older for uuid in page], self.expected)
+        self.assertEqual([len(page) for page in older], [4, 4, 4, 1])
+
+        # Back from the oldest message to the newest one
+        newer = self.walk(f"{self.url}?page_size=4&after={self.expected[-1]}", "previous")
+        self.assertEqual([uuid for page in reversed(newer) for uuid in page], self.expected[:-1])
+
+    def test_around(self):
+        for index in (0, 6, len(self.expected) - 1):
+            with self.subTest(index=index):
+                response = self.client.get(self.url, {"page_size": 5, "around": self.expected[index]}).json()
+                # Up to two newer messages, then the anchor and the older ones
+                start = max(0, index - 2)
+                self.assertEqual(
+                    [message["uuid"] for message in response["results"]], self.expected[start : start + 5]
+                )
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], CHAT_SYNC_BATCH_SIZE=4, CHAT_SYNC_GRACE_SECONDS=0)
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profiles = create_profiles(2)
+        cls.threads = Thread.objects.bulk_create([Thread() for _ in range(2)])
+        for thread in cls.threads:
+            for profile in cls.profiles:
+                ThreadParticipant.objects.create(thread=thread, profile=profile)
+        for i in range(11):
+            Message.objects.create(thread=cls.threads[i % 2], sender=cls.profiles[i % 2], content=f"Mensagem {i}")
+        # Every message changed in the same instant, so batches end in the middle of a tie
+        Message.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def sync(self, since: str | None = None) -> tuple[list[str], str, int]:
+        """UUIDs of the messages, last watermark and number of calls from a watermark until 'has_more' is false."""
+        uuids, calls = [], 0
+        while True:
+            params = {"profile": self.profiles[0].pk, **({"since": since} if since else {})}
+            response = self.client.get("/api/threads/sync/", params).json()
+            uuids += [message["uuid"] for message in response["messages"]]
+            since, calls = response["watermark"], calls + 1
+            if not response["has_more"]:
+                return uuids, since, calls
+
+    def test_resume(self):
+        uuids, since, calls = self.sync()
+        self.assertEqual(calls, 3)
+        self.assertEqual(sorted(uuids), sorted(str(uuid) for uuid in Message.objects.values_list("uuid", flat=True)))
+
+        # Only the rows changed since are returned afterwards
+        sent = Message.objects.create(thread=self.threads[0], sender=self.profiles[1], content="Nova")
+        deleted = Message.objects.get(content="Mensagem 3")
+        deleted.delete()
+        uuids, since, calls = self.sync(since)
+        self.assertEqual(sorted(uuids), sorted([str(sent.uuid), str(deleted.uuid)]))
+
+        self.assertEqual(self.sync(since)[0], [])
+
+
+@override_settings(CHAT_READ_RECEIPTS_BATCH_SIZE=2)
+class ReadReceiptBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        profiles = create_profiles(4)
+        cls.thread = Thread.objects.create()
+        cls.participants = [
+            ThreadParticipant.objects.create(thread=cls.thread, profile=profile) for profile in profiles
+        ]
+        cls.messages = [
+            Message.objects.create(thread=cls.thread, sender=profiles[0], content=f"Mensagem {i}") for i in range(3)
+        ]
+
+    def setUp(self):
+        # Flushed by hand instead of from timer threads
+        patcher = mock.patch.object(ReadReceiptBuffer, "schedule")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = ReadReceiptBuffer()
+
+    def flush(self) -> int:
+        with self.captureOnCommitCallbacks() as callbacks:
+            written = self.buffer.flush()
+        self.published = len(callbacks)
+        for participant in self.participants:
+            participant.refresh_from_db()
+        return written
+
+    def test_out_of_order(self):
+        first, second, third = (message.created_at for message in self.messages)
+        # Receipts arriving out of order only keep the latest one of each participant
+        self.buffer.add(self.participants[1].pk, second)
+        self.buffer.add(self.participants[1].pk, first)
+        self.buffer.add(self.participants[2].pk, first)
+        self.buffer.add(self.participants[3].pk, third)
+        self.buffer.add(self.participants[2].pk, third)
+
+        # Written in two batches of two participants at most
+        self.assertEqual(self.flush(), 3)
+        self.assertEqual(
+            [(participant.last_read_at, participant.unread_count) for participant in self.participants[1:]],
+            [(second, 1), (third, 0), (third, 0)],
+        )
+        self.assertEqual(self.published, 3)
+
+        # A late receipt older than the written one does not move 'last_read_at' back
+        self.buffer.add(self.participants[1].pk, first)
+        self.assertEqual(self.flush(), 0)
+        self.assertEqual((self.participants[1].last_read_at, self.participants[1].unread_count), (second, 1))
+        self.assertEqual(self.published, 0)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class IngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profiles = create_profiles(2)
+        cls.threads = Thread.objects.bulk_create([Thread() for _ in range(2)])
+        for thread in cls.threads:
+            for profile in cls.profiles:
+                ThreadParticipant.objects.create(thread=thread, profile=profile)
+        cls.items = [{"uuid": uuid4(), "content": f"Mensagem {i}"} for i in range(3)]
+
+    def test_replay(self):
+        rows, created = Message.ingest(self.threads[0], self.profiles[0], self.items)
+        self.assertEqual(created, 3)
+
+        replayed, created = Message.ingest(self.threads[0], self.profiles[0], self.items)
+        self.assertEqual(created, 0)
+        self.assertEqual([row.pk for row in replayed], [row.pk for row in rows])
+        self.assertEqual(Message.objects.count(), 3)
+        # Counted only once
+        participant = ThreadParticipant.objects.get(thread=self.threads[0], profile=self.profiles[1])
+        self.assertEqual(participant.unread_count, 3)
+
+        # Replayed with a new message once the first one was archived
+        ArchivedMessage.from_message(rows[0]).save()
+        Message.all_objects.filter(pk=rows[0].pk).delete()
+        items = [*self.items, {"uuid": uuid4(), "content": "Mensagem 3"}]
+        replayed, created = Message.ingest(self.threads[0], self.profiles[0], items)
+        self.assertEqual(created, 1)
+        self.assertIsInstance(replayed[0], ArchivedMessage)
+        self.assertEqual([row.uuid for row in replayed], [item["uuid"] for item in items])
+
+    def test_events(self):
+        with mock.patch("app.chat.events.get_broker") as get_broker:
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                Message.ingest(self.threads[0], self.profiles[0], self.items)
+
+        # The participants are read once for the whole batch, to publish the events
+        published = [query for query in queries if query["sql"].startswith('SELECT "thread_participant"."profile_id"')]
+        self.assertEqual(len(published), 1)
+        self.assertEqual(get_broker.return_value.publish.call_count, 3)
+
+    def test_endpoint(self):
+        data = {
+            "thread": str(self.threads[0].uuid),
+            "sender": self.profiles[0].pk,
+            "messages": [{"uuid": str(item["uuid"]), "content": item["content"]} for item in self.items],
+        }
+        created = self.client.post("/api/messages/bulk/", data, content_type="application/json")
+        replayed = self.client.post("/api/messages/bulk/", data, content_type="application/json")
+        self.assertEqual((created.status_code, replayed.status_code), (201, 200))
+        self.assertEqual(created.json(), replayed.json())
+
+        # The UUIDs already belong to messages of another thread
+        foreign = self.client.post(
+            "/api/messages/bulk/", data | {"thread": str(self.threads[1].uuid)}, content_type="application/json"
+        )
+        self.assertEqual(foreign.status_code, 400)
+        self.assertEqual(Message.objects.count(), 3)
@@ -1,21 +1,251 @@
-from app.chat.models import Message, Thread, ThreadParticipant
+import asyncio
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.http import HttpResponseBadRequest, HttpResponseNotFound, StreamingHttpResponse
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from app.chat.broker import get_broker, profile_channel
+from app.chat.models import ArchivedMessage, Message, Thread, ThreadParticipant
+from app.chat.pagination import InboxPagination, MessageKeysetPagination
+from app.chat.receipts import get_read_receipts
+from app.chat.search import get_message_search
 from app.chat.serializers import (
+    BulkMessageSerializer,
+    InboxEntrySerializer,
+    InboxSerializer,
     MessageSerializer,
+    ReadReceiptSerializer,
+    SearchMessageResultSerializer,
+    SearchMessageSerializer,
+    SyncMessageSerializer,
+    SyncSerializer,
+    SyncThreadParticipantSerializer,
+    SyncThreadSerializer,
+    SyncWatermarkField,
     ThreadParticipantSerializer,
     ThreadSerializer,
 )
+from app.profiles.models import Profile
 from app.utils import BaseModelViewSet
 
 
 class ThreadViewSet(BaseModelViewSet):
-    queryset = Thread.objects.prefetch_related(
-        "participants",
-        "participants__profile",
-        "participants__profile__user",
-        "messages",
-    ).all()
+    queryset = (
+        Thread.objects.prefetch_related(
+            "participants",
+            "participants__profile",
+            "participants__profile__user",
+            # Only the latest messages of each thread, fetched with a window function
+            Prefetch(
+                "messages",
+                queryset=Message.objects.select_related(
+                    "sender",
+                    "sender__user",
+                ).order_by("-created_at")[: settings.THREAD_LATEST_MESSAGES],
+                to_attr="latest_messages",
+            ),
+        )
+        .annotate(
+            # Archived messages included, as in the thread messages endpoint
+            message_count=Coalesce(
+                Subquery(
+                    Message.objects.filter(thread=OuterRef("pk"))
+                    .order_by()
+                    .values("thread")
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0,
+            )
+            + Coalesce(
+                Subquery(
+                    ArchivedMessage.objects.filter(thread=OuterRef("pk"), deleted_at__isnull=True)
+                    .order_by()
+                    .values("thread")
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0,
+            ),
+        )
+        .all()
+    )
     serializer_class = ThreadSerializer
     search_fields = filterset_fields = ["group"]
+    compile_list_serializer = True
+
+    def get_serializer_class(self):
+        if self.action == "messages":
+            return MessageSerializer
+        if self.action == "inbox":
+            return InboxEntrySerializer
+        return super().get_serializer_class()
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                param,
+                openapi.IN_QUERY,
+                description=description,
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_UUID,
+                required=False,
+            )
+            for param, description in MessageKeysetPagination.get_anchor_descriptions()
+        ],
+        responses={status.HTTP_200_OK: MessageSerializer(many=True)},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="messages",
+        url_name="messages",
+    )
+    def messages(self, request, *args, **kwargs):
+        """Full message history of a thread, archived messages included, newest first and keyset paginated."""
+        thread = self.get_object()
+        messages = thread.messages.select_related(
+            "sender",
+            "sender__user",
+        )
+
+        archive = thread.archived_messages.select_related(
+            "sender",
+            "sender__user",
+        ).filter(deleted_at__isnull=True)
+
+        paginator = MessageKeysetPagination()
+        page = paginator.paginate_queryset(messages, request, view=self, archive=archive)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        query_serializer=InboxSerializer,
+        responses={status.HTTP_200_OK: InboxEntrySerializer(many=True)},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="inbox",
+        url_name="inbox",
+    )
+    def inbox(self, request, *args, **kwargs):
+        """Threads of a profile, most recent activity first and cursor paginated.
+
+        Reads the participations of the profile in a single range of the '(profile, -last_activity_at)'
+        index, with the last message, unread count and last activity denormalized on the rows.
+        """
+        params = InboxSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        participants = ThreadParticipant.objects.select_related(
+            "thread",
+            "thread__last_message",
+            "thread__last_message__sender",
+            "thread__last_message__sender__user",
+        ).filter(
+            profile=params.validated_data["profile"],
+            deleted_at__isnull=True,
+            thread__deleted_at__isnull=True,
+        )
+
+        paginator = InboxPagination()
+        page = paginator.paginate_queryset(participants, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(query_serializer=SyncSerializer)
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="sync",
+        url_name="sync",
+    )
+    def sync(self, request, *args, **kwargs):
+        """Threads, participants and messages of a profile created, updated or soft deleted since a watermark.
+
+        Clients send back the returned 'watermark' as 'since' on the next call, without 'since' on the
+        first one. Rows are returned in ('updated_at', 'id') order, at most CHAT_SYNC_BATCH_SIZE of each
+        kind; 'has_more' tells the client to call again right away. The watermark holds the position
+        reached in each kind, so that rows sharing an 'updated_at' across a batch boundary are neither
+        skipped nor returned forever. A row may still be returned more than once, so clients upsert
+        rows by UUID. The history of threads joined since the watermark is loaded from the thread
+        messages endpoint.
+        """
+        params = SyncSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        profile = params.validated_data["profile"]
+        since = params.validated_data.get("since")
+        now = timezone.now() - timedelta(seconds=settings.CHAT_SYNC_GRACE_SECONDS)
+
+        # Soft deleted rows are changes too, so every manager here includes them
+        participations = ThreadParticipant.all_objects.filter(profile=profile)
+        changes = {
+            # A thread also changes for the profile when its participation does
+            "threads": Thread.all_objects.select_related("last_message")
+            .filter(pk__in=participations.values("thread"))
+            .annotate(
+                changed_at=Greatest(
+                    "updated_at",
+                    Subquery(
+                        participations.filter(thread=OuterRef("pk")).order_by("-updated_at").values("updated_at")[:1]
+                    ),
+                )
+            ),
+            "participants": ThreadParticipant.all_objects.select_related(
+                "thread",
+                "profile",
+                "profile__user",
+            ).filter(thread__in=participations.values("thread")),
+            "messages": Message.all_objects.select_related(
+                "thread",
+                "sender",
+                "sender__user",
+            ).filter(thread__in=participations.values("thread")),
+        }
+        serializer_classes = {
+            "threads": SyncThreadSerializer,
+            "participants": SyncThreadParticipantSerializer,
+            "messages": SyncMessageSerializer,
+        }
+
+        data, watermark, has_more = {}, {}, False
+        batch_size = settings.CHAT_SYNC_BATCH_SIZE
+        for kind, qs in changes.items():
+            field = "changed_at" if kind == "threads" else "updated_at"
+            if since:
+                updated_at, pk = since[kind]
+                qs = qs.filter(Q(**{f"{field}__gt": updated_at}) | Q(**{field: updated_at, "id__gt": pk}))
+
+            rows = list(qs.order_by(field, "id")[: batch_size + 1])
+            if len(rows) > batch_size:
+                # Resume right after the last row returned
+                rows = rows[:batch_size]
+                watermark[kind] = (getattr(rows[-1], field), rows[-1].pk)
+                has_more = True
+            else:
+                # Rows committed late may still show up with an 'updated_at' within the grace period
+                watermark[kind] = (now, 0)
+            data[kind] = serializer_classes[kind](rows, many=True, context=self.get_serializer_context()).data
+
+        return Response(
+            {"watermark": SyncWatermarkField().to_representation(watermark), "has_more": has_more, **data},
+            status=status.HTTP_200_OK,
+        )
 
 
 class ThreadParticipantViewSet(BaseModelViewSet):
@@ -27,6 +257,32 @@ class ThreadParticipantViewSet(BaseModelViewSet):
     serializer_class = ThreadParticipantSerializer
     search_fields = filterset_fields = ["thread", "profile"]
 
+    @swagger_auto_schema(
+        request_body=ReadReceiptSerializer,
+        responses={status.HTTP_202_ACCEPTED: ReadReceiptSerializer},
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="read",
+        url_name="read",
+    )
+    def read(self, request, *args, **kwargs):
+        """Mark the thread as read up to 'last_read_at', now by default.
+
+        The receipt is buffered and written in bulk shortly after, 'last_read_at' never moves back.
+        """
+        params = ReadReceiptSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+
+        participant = self.get_object()
+        now = timezone.now()
+        # Receipts from clients with clocks ahead cannot mark future messages as read
+        last_read_at = min(params.validated_data.get("last_read_at", now), now)
+        get_read_receipts().add(participant.pk, last_read_at)
+
+        return Response({"last_read_at": last_read_at}, status=status.HTTP_202_ACCEPTED)
+
 
 class MessageViewSet(BaseModelViewSet):
     queryset = Message.objects.select_related(
@@ -36,3 +292,139 @@ class MessageViewSet(BaseModelViewSet):
     ).all()
     serializer_class = MessageSerializer
     search_fields = filterset_fields = ["thread", "sender"]
+
+    # The keyset pagination sets the order itself
+    pagination_class = MessageKeysetPagination
+    filter_backends = [
+        filters.SearchFilter,
+        DjangoFilterBackend,
+    ]
+
+    compile_list_serializer = True
+
+    def get_archive_queryset(self):
+        """Archived messages matching the same filters, read by the pagination past the hot ones."""
+        queryset = self.filter_queryset(
+            ArchivedMessage.objects.select_related(
+                "thread",
+                "sender",
+                "sender__user",
+            ).filter(deleted_at__isnull=True)
+        )
+        # Read as the same rows as the hot messages when the list is compiled
+        if compiled := self.get_compiled_serializer():
+            return compiled.rows(queryset)
+        return queryset
+
+    @swagger_auto_schema(
+        query_serializer=SearchMessageSerializer,
+        responses={status.HTTP_200_OK: SearchMessageResultSerializer(many=True)},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="search",
+        url_name="search",
+        # Scoped by its own query params, which would clash with the filters of the list
+        filter_backends=[],
+        pagination_class=None,
+    )
+    def search(self, request, *args, **kwargs):
+        """Full-text search over message contents, best matches first.
+
+        Scoped to a thread and/or to the threads of a profile, returns up to 'limit' results.
+        """
+        params = SearchMessageSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        messages = Message.objects.select_related(
+            "thread",
+            "sender",
+            "sender__user",
+        )
+        if thread := params.validated_data.get("thread"):
+            messages = messages.filter(thread=thread)
+        if profile := params.validated_data.get("profile"):
+            messages = messages.filter(
+                thread__in=ThreadParticipant.objects.filter(profile=profile, deleted_at__isnull=True).values("thread")
+            )
+
+        results = get_message_search().search(messages, params.validated_data["q"])
+        serializer = SearchMessageResultSerializer(
+            results[: params.validated_data["limit"]],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        request_body=BulkMessageSerializer,
+        responses={
+            status.HTTP_201_CREATED: MessageSerializer(many=True),
+            status.HTTP_200_OK: MessageSerializer(many=True),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk",
+        url_name="bulk",
+    )
+    def bulk(self, request, *args, **kwargs):
+        """Send a batch of messages to a thread with a single insert.
+
+        Each message carries a client-generated 'uuid' used as idempotency key: replayed messages
+        are not inserted again. Returns the canonical rows of the batch, with 201 if any message
+        was inserted and 200 if all of them already existed.
+        """
+        params = BulkMessageSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+
+        try:
+            messages, created = Message.ingest(
+                thread=params.validated_data["thread"],
+                sender=params.validated_data["sender"],
+                items=params.validated_data["messages"],
+            )
+        except DjangoValidationError as e:
+            raise ValidationError(e.message_dict)
+
+        serializer = self.get_serializer(messages, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+async def events(request):
+    """Server-Sent Events stream of the new messages and read receipts of a profile's threads.
+
+    Requires the ASGI application. Each event is a 'message' or 'read' event whose data is the
+    row as returned by the sync endpoint. Clients that fall too far behind are disconnected and
+    catch up with the sync endpoint before reconnecting.
+    """
+    try:
+        profile_id = int(request.GET["profile"])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("A valid 'profile' query param is required.")
+    if not await Profile.objects.filter(pk=profile_id).aexists():
+        return HttpResponseNotFound("Profile not found.")
+
+    async def stream():
+        subscription = get_broker().subscribe([profile_channel(profile_id)])
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), settings.CHAT_EVENTS_KEEPALIVE_SECONDS)
+                except TimeoutError:
+                    # Comment lines keep proxies from closing idle connections
+                    yield ": keepalive\n\n"
+                    continue
+
+                if event is None:
+                    return
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'], cls=DjangoJSONEncoder)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,132 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+
+class PurgeDeletedCommand(BaseCommand):
+    """Base class for the commands hard deleting the soft deleted rows of an app.
+
+    Purges the models of 'app_label' listed in 'SOFT_DELETE_RETENTION_DAYS', in that order, once
+    their retention is over. Subclasses narrow down the purged rows with 'get_queryset' and keep
+    denormalized data in sync with 'delete'.
+    """
+
+    app_label = None
+
+    def get_labels(self) -> list[str]:
+        return [label for label in settings.SOFT_DELETE_RETENTION_DAYS if label.split(".")[0] == self.app_label]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            choices=self.get_labels(),
+            help="Only purge this model, may be repeated. Defaults to every model.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Override the retention of every purged model, in days.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of rows deleted per batch. Defaults to 500.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to sleep between batches, to let other writers through. Defaults to 0.1.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows that would be purged.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        now = timezone.now()
+        total_rows, total_bytes = 0, 0
+        for label in self.get_labels():
+            if options["models"] and label not in options["models"]:
+                continue
+
+            model = apps.get_model(label)
+            days = options["days"] if options["days"] is not None else settings.SOFT_DELETE_RETENTION_DAYS[label]
+            qs = self.get_queryset(model, now - timedelta(days=days))
+
+            if options["dry_run"]:
+                self.stdout.write(f"{label}: {qs.count()} rows would be purged.")
+                continue
+
+            size, count = self.table_size(model), model._base_manager.count()
+            rows = self.purge(label, qs, options["batch_size"], options["sleep"])
+
+            # Estimated from the average row size, the database reuses the freed pages
+            reclaimed = size * rows // count if size is not None and count else 0
+            total_rows, total_bytes = total_rows + rows, total_bytes + reclaimed
+            self.stdout.write(f"{label}: {rows} rows purged, ~{filesizeformat(reclaimed)} reclaimed.")
+
+        if not options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"{total_rows} rows purged, ~{filesizeformat(total_bytes)} reclaimed.")
+            )
+
+    def get_queryset(self, model, cutoff):
+        """Rows of a model to purge, soft deleted before the cutoff."""
+        # The base manager returns every row, soft deleted or not
+        return model._base_manager.filter(deleted_at__lt=cutoff)
+
+    def delete(self, model, pks: list) -> None:
+        """Hard delete a batch of rows, within a transaction."""
+        model._base_manager.filter(pk__in=pks).delete()
+
+    def purge(self, label: str, qs, batch_size: int, sleep: float) -> int:
+        last_pk, purged = None, 0
+        while True:
+            batch = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+            pks = list(batch.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return purged
+
+            with transaction.atomic():
+                self.delete(qs.model, pks)
+
+            last_pk = pks[-1]
+            purged += len(pks)
+            self.stdout.write(f"{label}: {purged} rows purged so far.")
+            if sleep:
+                time.sleep(sleep)
+
+    @staticmethod
+    def table_size(model) -> int | None:
+        """Size in bytes of the model's table and indexes, None when the database cannot tell."""
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            elif connection.vendor == "sqlite":
+                try:
+                    cursor.execute(
+                        "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                        "(SELECT name FROM sqlite_master WHERE tbl_name = %s)",
+                        [table],
+                    )
+                except DatabaseError:
+                    # SQLite builds without the dbstat virtual table
+                    return None
+            else:
+                return None
+            return cursor.fetchone()[0]
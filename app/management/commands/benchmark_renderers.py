@@ -0,0 +1,85 @@
+import json
+import statistics
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from app.renderers import FastJSONRenderer
+
+RENDERERS = {
+    "json": JSONRenderer,
+    "fastjson": FastJSONRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the default JSON renderer with the fast streaming one on API endpoints. Every path is "
+        "requested through the whole middleware and view stack with each renderer, then the decoded "
+        "response is encoded again by each renderer alone, to isolate the encoding cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            default=["/api/profiles/", "/api/addresses/", "/api/threads/"],
+            help="API paths to request. Defaults to the profiles, addresses and threads lists.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Timed requests per path and renderer. Defaults to 20.",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            help="Value of the 'page_size' query param, for paginations reading it.",
+        )
+        parser.add_argument(
+            "--host",
+            type=str,
+            default="localhost",
+            help="Host header of the requests, must be allowed by ALLOWED_HOSTS. Defaults to 'localhost'.",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        client = Client(HTTP_HOST=options["host"])
+        params = {"page_size": options["page_size"]} if options["page_size"] else {}
+
+        for path in options["paths"]:
+            self.stdout.write(self.style.MIGRATE_HEADING(path))
+            data = None
+            for name, renderer in RENDERERS.items():
+                # The first request warms up the caches and is not timed
+                body = self.fetch(client, path, {**params, "format": name})
+                timings = []
+                for _ in range(options["iterations"]):
+                    start = perf_counter()
+                    self.fetch(client, path, {**params, "format": name})
+                    timings.append((perf_counter() - start) * 1000)
+                data = json.loads(body) if data is None else data
+
+                self.stdout.write(
+                    f"  {name:<9} request: median {statistics.median(timings):8.2f} ms, "
+                    f"mean {statistics.mean(timings):8.2f} ms, {len(body)} bytes"
+                )
+
+            for name, renderer in RENDERERS.items():
+                start = perf_counter()
+                for _ in range(options["iterations"]):
+                    renderer().render(data, renderer.media_type)
+                elapsed = (perf_counter() - start) * 1000 / options["iterations"]
+                self.stdout.write(f"  {name:<9} encode:  mean {elapsed:8.3f} ms")
+
+    def fetch(self, client: Client, path: str, params: dict) -> bytes:
+        response = client.get(path, params)
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}.")
+        return b"".join(response.streaming_content) if response.streaming else response.content
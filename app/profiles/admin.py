@@ -7,7 +7,7 @@ from unfold.admin import ModelAdmin, StackedInline
 from unfold.decorators import action, display
 from unfold.forms import AdminPasswordChangeForm, UserChangeForm, UserCreationForm
 
-from app.api import NominatimAPI, ViaCEPAPI
+from app.api import APIUnavailable, NominatimAPI, ViaCEPAPI
 from app.profiles.models import Address, Profile
 from app.utils import BaseAdmin
 
@@ -72,8 +72,9 @@ class AddressInline(StackedInline):
         "state",
         "region",
         "country",
+        "geocoding_status",
     )
-    readonly_fields = ("latitude", "longitude")
+    readonly_fields = ("latitude", "longitude", "geocoding_status")
 
 
 # Admins
@@ -164,7 +165,10 @@ class ProfileAdmin(BaseAdmin):
     def geocode_cep_nominatim(self, request, object_id):
         profile = self.get_object(request, object_id)
         address = profile.address
-        lat, lon = NominatimAPI.search(zip_code=address.zip_code)
+        try:
+            lat, lon = NominatimAPI.search(zip_code=address.zip_code)
+        except APIUnavailable:
+            lat = lon = None
 
         if isinstance(lat, float) and isinstance(lon, float):
             address.latitude = lat
@@ -187,7 +191,10 @@ class ProfileAdmin(BaseAdmin):
     def get_cep_viacep(self, request, object_id):
         profile = self.get_object(request, object_id)
         address = profile.address
-        address_data = ViaCEPAPI.search(zip_code="21645010")
+        try:
+            address_data = ViaCEPAPI.search(zip_code="21645010")
+        except APIUnavailable:
+            address_data = None
 
         if address_data:
             address.street = address_data.get("street")
@@ -223,8 +230,9 @@ class AddressAdmin(BaseAdmin):
         "full_address",
         "state",
         "country",
+        "get_geocoding_status",
     )
-    list_filter = BaseAdmin.list_filter + ("state",)
+    list_filter = BaseAdmin.list_filter + ("state", "geocoding_status")
 
     # Changeform
     fieldsets = (
@@ -263,3 +271,14 @@ class AddressAdmin(BaseAdmin):
     @display(description="Endereço")
     def full_address(self, obj):
         return str(obj)
+
+    @display(
+        description="Geocodificação",
+        label={
+            Address.GEOCODING_PENDING: "warning",
+            Address.GEOCODING_DONE: "success",
+            Address.GEOCODING_FAILED: "danger",
+        },
+    )
+    def get_geocoding_status(self, obj):
+        return obj.geocoding_status, obj.get_geocoding_status_display()
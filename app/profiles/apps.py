@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProfileConfig(AppConfig):
     name = "app.profiles"
     verbose_name = "Gerenciamento de Perfis"
+
+    def ready(self):
+        # Connects the signal receivers
+        from app.profiles import signals  # noqa: F401
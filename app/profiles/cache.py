@@ -0,0 +1,94 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from app.utils import bounding_box, geohash_center, geohash_cover, geohash_encode, geohash_steps, haversine_km
+
+
+class NearbyCache:
+    """Cache of the instructors near each geohash cell, one entry per cell and radius bucket.
+
+    An entry holds the (id, latitude, longitude) rows of the instructors within the bucket radius
+    plus the half-diagonal of the cell from the cell center. It is therefore a superset of the
+    result of any search centered inside the cell with a radius up to the bucket, which callers
+    refine in memory.
+
+    Entries live in the default cache, which is per process unless 'CACHES' points at a shared
+    backend. The cache is best-effort: rows may refer to profiles deleted or moved since, until
+    'invalidate' reaches every process or the entry expires, so callers must tolerate stale ids.
+    """
+
+    key_prefix = "nearby"
+
+    @staticmethod
+    def bucket(radius_km: float) -> tuple[float, int] | None:
+        """Smallest radius bucket covering a radius.
+
+        Args:
+            radius_km (float): Search radius in kilometers.
+
+        Returns:
+            tuple[float, int] or None: Bucket radius in kilometers and its geohash precision,
+                None if the radius is larger than every bucket.
+        """
+        for bucket_km, precision in settings.NEARBY_CACHE_BUCKETS:
+            if radius_km <= bucket_km:
+                return bucket_km, precision
+        return None
+
+    @staticmethod
+    def half_diagonal(precision: int) -> float:
+        """Upper bound of the distance between a cell center and its corners, reached at the equator."""
+        lat_step, lon_step = geohash_steps(precision)
+        return haversine_km(0.0, 0.0, lat_step / 2, lon_step / 2)
+
+    @classmethod
+    def key(cls, geohash: str, bucket_km: float) -> str:
+        return f"{cls.key_prefix}:{bucket_km:g}:{geohash}"
+
+    @classmethod
+    def get_rows(cls, lat: float, lon: float, radius_km: float, loader) -> np.ndarray | None:
+        """Candidate rows of a search, loading and caching the entry of its cell on a miss.
+
+        Args:
+            lat (float): Latitude of the center point in decimal degrees.
+            lon (float): Longitude of the center point in decimal degrees.
+            radius_km (float): Search radius in kilometers.
+            loader (Callable[[float, float, float], np.ndarray]): Function returning the rows within
+                a radius from a point, called on a cache miss.
+
+        Returns:
+            np.ndarray or None: Candidate (id, latitude, longitude) rows, None if the radius is not cacheable.
+        """
+        if (bucket := cls.bucket(radius_km)) is None:
+            return None
+
+        bucket_km, precision = bucket
+        geohash = geohash_encode(lat, lon, precision)
+        key = cls.key(geohash, bucket_km)
+
+        rows = cache.get(key)
+        if rows is None:
+            center_lat, center_lon = geohash_center(geohash)
+            rows = loader(center_lat, center_lon, bucket_km + cls.half_diagonal(precision))
+            cache.set(key, rows, settings.NEARBY_CACHE_TIMEOUT)
+        return rows
+
+    @classmethod
+    def invalidate(cls, points) -> None:
+        """Drop the entries of every cell whose results may include any of the given points.
+
+        Args:
+            points (Iterable[tuple[float, float]]): Latitude and longitude of the changed points.
+        """
+        keys = set()
+        for lat, lon in points:
+            if lat is None or lon is None:
+                continue
+
+            for bucket_km, precision in settings.NEARBY_CACHE_BUCKETS:
+                box = bounding_box(lat, lon, bucket_km + cls.half_diagonal(precision))
+                keys.update(cls.key(geohash, bucket_km) for geohash in geohash_cover(*box, precision))
+
+        if keys:
+            cache.delete_many(keys)
@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic, sleep
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.profiles.cache import NearbyCache
+from app.profiles.models import Address, ZipCodeLookup
+from app.profiles.spatial import get_spatial_index
+
+
+class Throttle:
+    """Spread calls across threads so that at most 'rate' of them start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = 0.0
+        self.lock = Lock()
+
+    def wait(self):
+        with self.lock:
+            now = monotonic()
+            start_at = max(now, self.next_at)
+            self.next_at = start_at + self.interval
+        sleep(max(0.0, start_at - now))
+
+
+class Command(BaseCommand):
+    help = (
+        "Geocode the addresses missing coordinates or address fields, resolving each CEP only once. "
+        "Results are written back batch by batch, so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of concurrent CEP lookups. Defaults to 4.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0.0,
+            help=(
+                "Maximum CEP lookups per second sent to the external APIs, 0 for no limit. "
+                "The clients already enforce the rate limit of each provider. Defaults to 0."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of CEPs resolved, and of addresses written, per batch. Defaults to 500.",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also retry the addresses whose geocoding already failed.",
+        )
+
+    def handle(self, *args, **options):
+        self.throttle = Throttle(options["rate"])
+        batch_size = options["batch_size"]
+
+        missing = Q()
+        for field in ("latitude", "longitude", "street", "neighborhood", "city", "state"):
+            missing |= Q(**{f"{field}__isnull": True})
+        qs = Address.objects.filter(missing)
+        if not options["retry_failed"]:
+            qs = qs.exclude(geocoding_status=Address.GEOCODING_FAILED)
+
+        zip_codes = list(qs.order_by("zip_code").values_list("zip_code", flat=True).distinct())
+        self.stdout.write(f"{len(zip_codes)} CEPs to resolve.")
+
+        done, updated = 0, 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for start in range(0, len(zip_codes), batch_size):
+                chunk = zip_codes[start : start + batch_size]
+                resolved = dict(zip(chunk, executor.map(self.resolve, chunk)))
+                updated += self.write_back(qs.filter(zip_code__in=chunk), resolved, batch_size)
+                done += len(chunk)
+                self.stdout.write(f"[{done}/{len(zip_codes)}] CEPs resolved, {updated} addresses updated.")
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} addresses geocoded from {len(zip_codes)} CEPs."))
+
+    def resolve(self, zip_code: str) -> tuple:
+        """Resolve a CEP, throttling only the lookups not answered by ZipCodeLookup."""
+        try:
+            cached = ZipCodeLookup.get_fresh(zip_code, ZipCodeLookup.SOURCE_NOMINATIM) and ZipCodeLookup.get_fresh(
+                zip_code, ZipCodeLookup.SOURCE_VIACEP
+            )
+            if not cached:
+                self.throttle.wait()
+            return Address.resolve_zip_code(zip_code)
+        finally:
+            # Worker threads hold their own database connections
+            close_old_connections()
+
+    def write_back(self, qs, resolved: dict, batch_size: int) -> int:
+        """Apply the resolved CEPs to the addresses of a queryset, in keyset-ordered batches.
+
+        Args:
+            qs (models.QuerySet[Address]): Addresses to be updated.
+            resolved (dict): Resolved coordinates and address data by CEP.
+            batch_size (int): Number of addresses written per batch.
+
+        Returns:
+            int: Number of addresses written.
+        """
+        fields = [*Address.GEOCODED_FIELDS, "geocoding_status", "updated_at"]
+        last_pk, written = 0, 0
+
+        while addresses := list(qs.filter(pk__gt=last_pk).order_by("pk")[:batch_size]):
+            now = timezone.now()
+            for address in addresses:
+                address.apply_geocoding(*resolved[address.zip_code])
+                address.updated_at = now
+
+            # bulk_update bypasses Address.save, so the spatial index and the cache are synced here
+            with transaction.atomic():
+                Address.objects.bulk_update(addresses, fields)
+                get_spatial_index().update(addresses)
+            NearbyCache.invalidate((address.latitude, address.longitude) for address in addresses)
+
+            last_pk = addresses[-1].pk
+            written += len(addresses)
+
+        return written
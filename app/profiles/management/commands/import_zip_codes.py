@@ -0,0 +1,113 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app.profiles.models import ZipCodeLookup
+
+ADDRESS_FIELDS = ("street", "neighborhood", "city", "state", "region", "country")
+
+
+class Command(BaseCommand):
+    help = (
+        "Import an offline CEP dataset into the ZipCodeLookup table. The CSV must have a 'zip_code' column "
+        "and may have 'latitude', 'longitude', 'street', 'neighborhood', 'city', 'state', 'region' and "
+        "'country' columns. Imported CEPs never expire and are resolved without any HTTP request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            type=str,
+            help="Path of the CSV file.",
+        )
+        parser.add_argument(
+            "--delimiter",
+            type=str,
+            default=",",
+            help="CSV delimiter. Defaults to ','.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of CEPs written per batch. Defaults to 5000.",
+        )
+
+    def handle(self, *args, **options):
+        connection.ensure_connection()  # Ensure DB connection is alive
+        try:
+            file = open(options["path"], newline="", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Error opening dataset: {e}")
+
+        imported = 0
+        with file:
+            reader = csv.DictReader(file, delimiter=options["delimiter"])
+            if "zip_code" not in (reader.fieldnames or []):
+                raise CommandError("The dataset must have a 'zip_code' column.")
+
+            batch = []
+            for line, row in enumerate(reader, start=2):
+                try:
+                    batch.append(self.build(row))
+                except ValueError as e:
+                    raise CommandError(f"Invalid row at line {line}: {e}")
+
+                if len(batch) >= options["batch_size"]:
+                    imported += self.write(batch)
+                    batch = []
+
+            imported += self.write(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"{imported} CEPs imported."))
+
+    def build(self, row: dict) -> ZipCodeLookup:
+        """Build a lookup from a CSV row, flagging as found the sources whose data is present."""
+        now = timezone.now()
+        values = {field: (row.get(field) or "").strip() or None for field in ADDRESS_FIELDS}
+        lookup = ZipCodeLookup(zip_code=ZipCodeLookup.normalize(row["zip_code"]), origin=ZipCodeLookup.ORIGIN_DATASET)
+
+        if not lookup.zip_code:
+            raise ValueError("empty zip_code")
+
+        latitude, longitude = (row.get("latitude") or "").strip(), (row.get("longitude") or "").strip()
+        if latitude and longitude:
+            lookup.latitude, lookup.longitude = float(latitude), float(longitude)
+            lookup.nominatim_status, lookup.nominatim_fetched_at = ZipCodeLookup.STATUS_FOUND, now
+
+        if any(values.values()):
+            for field, value in values.items():
+                setattr(lookup, field, value)
+            lookup.viacep_status, lookup.viacep_fetched_at = ZipCodeLookup.STATUS_FOUND, now
+
+        return lookup
+
+    def write(self, batch: list) -> int:
+        if not batch:
+            return 0
+
+        # Later rows of the same CEP win, as a single INSERT cannot update the same row twice
+        batch = list({lookup.zip_code: lookup for lookup in batch}.values())
+
+        # Only the columns of the sources present in a row are updated, keeping the data of the other one
+        groups = {}
+        for lookup in batch:
+            sources = (lookup.nominatim_status is not None, lookup.viacep_status is not None)
+            groups.setdefault(sources, []).append(lookup)
+
+        for (has_coordinates, has_address), lookups in groups.items():
+            update_fields = ["origin", "updated_at"]
+            if has_coordinates:
+                update_fields += ["latitude", "longitude", "nominatim_status", "nominatim_fetched_at"]
+            if has_address:
+                update_fields += [*ADDRESS_FIELDS, "viacep_status", "viacep_fetched_at"]
+
+            ZipCodeLookup.objects.bulk_create(
+                lookups,
+                update_conflicts=True,
+                unique_fields=["zip_code"],
+                update_fields=update_fields,
+            )
+        return len(batch)
@@ -0,0 +1,31 @@
+from django.db.models import Exists, OuterRef
+
+from app.chat.models import ArchivedMessage, Message, ThreadParticipant
+from app.commands import PurgeDeletedCommand
+from app.profiles.models import Profile
+
+
+class Command(PurgeDeletedCommand):
+    help = (
+        "Hard delete the addresses and profiles soft deleted longer ago than their model's retention in "
+        "'SOFT_DELETE_RETENTION_DAYS', in small keyset-ordered batches. Profiles still sending live "
+        "messages or taking part in live threads are kept, as deleting them would cascade to chat rows "
+        "without updating the unread counters and the last message of their threads. Run "
+        "'purge_deleted_chat' first to let them go."
+    )
+
+    app_label = "profiles"
+
+    def get_queryset(self, model, cutoff):
+        qs = super().get_queryset(model, cutoff)
+        if model is not Profile:
+            return qs
+
+        kept = qs.filter(
+            Exists(Message.objects.filter(sender=OuterRef("pk")))
+            | Exists(ArchivedMessage.objects.filter(sender=OuterRef("pk"), deleted_at__isnull=True))
+            | Exists(ThreadParticipant.objects.filter(profile=OuterRef("pk"), thread__deleted_at__isnull=True))
+        )
+        if kept_count := kept.count():
+            self.stdout.write(f"{Profile._meta.label}: {kept_count} rows kept, still referenced by live chat rows.")
+        return qs.exclude(pk__in=kept.values("pk"))
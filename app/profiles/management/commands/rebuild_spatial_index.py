@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app.profiles.spatial import get_spatial_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the spatial index of addresses from the 'address' table."
+
+    def handle(self, *args, **options):
+        index = get_spatial_index()
+        index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Spatial index rebuilt ({type(index).__name__})."))
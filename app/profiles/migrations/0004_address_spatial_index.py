@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+def create_spatial_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS address_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+        )
+        schema_editor.execute(
+            "INSERT OR REPLACE INTO address_rtree (id, min_lat, max_lat, min_lon, max_lon) "
+            "SELECT id, latitude, latitude, longitude, longitude FROM address "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        )
+
+    elif vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS cube")
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS earthdistance")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS address_earth_idx ON address USING gist (ll_to_earth(latitude, longitude)) "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        )
+
+
+def drop_spatial_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS address_rtree")
+
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS address_earth_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_alter_address_zip_code_alter_profile_cpf'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_spatial_index, drop_spatial_index),
+    ]
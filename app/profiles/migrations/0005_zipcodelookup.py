@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-17 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_address_spatial_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZipCodeLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='atualizado em')),
+                ('zip_code', models.CharField(max_length=20, unique=True, verbose_name='CEP')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='latitude')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='longitude')),
+                ('nominatim_status', models.CharField(blank=True, choices=[('found', 'Encontrado'), ('not_found', 'Não encontrado')], max_length=10, null=True, verbose_name='status Nominatim')),
+                ('nominatim_fetched_at', models.DateTimeField(blank=True, null=True, verbose_name='consultado no Nominatim em')),
+                ('street', models.CharField(blank=True, max_length=255, null=True, verbose_name='logradouro')),
+                ('neighborhood', models.CharField(blank=True, max_length=255, null=True, verbose_name='bairro')),
+                ('city', models.CharField(blank=True, max_length=255, null=True, verbose_name='cidade')),
+                ('state', models.CharField(blank=True, max_length=255, null=True, verbose_name='estado')),
+                ('region', models.CharField(blank=True, max_length=255, null=True, verbose_name='região')),
+                ('country', models.CharField(blank=True, max_length=255, null=True, verbose_name='país')),
+                ('viacep_status', models.CharField(blank=True, choices=[('found', 'Encontrado'), ('not_found', 'Não encontrado')], max_length=10, null=True, verbose_name='status ViaCEP')),
+                ('viacep_fetched_at', models.DateTimeField(blank=True, null=True, verbose_name='consultado no ViaCEP em')),
+            ],
+            options={
+                'verbose_name': 'consulta de CEP',
+                'verbose_name_plural': 'consultas de CEP',
+                'db_table': 'zip_code_lookup',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-17 21:08
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_geocoded_addresses(apps, schema_editor):
+    Address = apps.get_model("profiles", "Address")
+    missing = Q()
+    for field in ("latitude", "longitude", "street", "neighborhood", "city", "state"):
+        missing |= Q(**{f"{field}__isnull": True})
+    missing |= Q(street="") | Q(neighborhood="") | Q(city="") | Q(state="")
+    Address.objects.exclude(missing).update(geocoding_status="done")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_zipcodelookup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='geocoding_status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('done', 'Concluída'), ('failed', 'Falhou')], db_index=True, default='pending', max_length=10, verbose_name='geocodificação'),
+        ),
+        migrations.RunPython(mark_geocoded_addresses, migrations.RunPython.noop),
+    ]
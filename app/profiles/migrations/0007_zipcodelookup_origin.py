@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_address_geocoding_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zipcodelookup',
+            name='origin',
+            field=models.CharField(choices=[('api', 'API'), ('dataset', 'Base offline')], default='api', max_length=10, verbose_name='origem'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 21:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0007_zipcodelookup_origin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='latitude'),
+        ),
+        migrations.AlterField(
+            model_name='address',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='longitude'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('latitude__isnull', False), ('longitude__isnull', False)), fields=['latitude', 'longitude'], name='address_coordinates_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['type', '-created_at'], name='profile_type_live_idx'),
+        ),
+    ]
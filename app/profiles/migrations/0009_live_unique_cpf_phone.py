@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 21:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_live_partial_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='cpf',
+            field=models.CharField(max_length=11, verbose_name='CPF'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='phone',
+            field=models.CharField(max_length=13, verbose_name='telefone'),
+        ),
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('cpf',), name='profile_cpf_live_unique', violation_error_message='Já existe um perfil com este CPF.'),
+        ),
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('phone',), name='profile_phone_live_unique', violation_error_message='Já existe um perfil com este telefone.'),
+        ),
+    ]
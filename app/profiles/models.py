@@ -1,11 +1,17 @@
 import re
+from functools import partial
 
+import numpy as np
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 
-from app.api import NominatimAPI, ViaCEPAPI
-from app.utils import SoftDeleteModel, TimestampedModel, bounding_box, haversine_km
+from app.api import APIUnavailable, NominatimAPI, ViaCEPAPI
+from app.profiles.cache import NearbyCache
+from app.profiles.spatial import get_spatial_index
+from app.utils import SoftDeleteModel, TimestampedModel, haversine_km_many
 
 
 class Profile(TimestampedModel, SoftDeleteModel):
@@ -31,39 +37,138 @@ class Profile(TimestampedModel, SoftDeleteModel):
         max_length=10,
         choices=TYPE_CHOICES,
     )
-    cpf = models.CharField(verbose_name="CPF", unique=True, max_length=11)
-    phone = models.CharField(verbose_name="telefone", unique=True, max_length=13)
+    cpf = models.CharField(verbose_name="CPF", max_length=11)
+    phone = models.CharField(verbose_name="telefone", max_length=13)
     birthdate = models.DateField(verbose_name="data de nascimento")
 
-    def save(self, *args, **kwargs):
-        if not self.address.latitude or not self.address.longitude:
-            try:
-                lat, lon = NominatimAPI.search(self.address.zip_code)
-                if isinstance(lat, float) and isinstance(lon, float):
-                    self.address.latitude = lat
-                    self.address.longitude = lon
-            except Exception:
-                print("Error geocoding address")
-
-        if not self.address.street or not self.address.neighborhood or not self.address.city or not self.address.state:
-            try:
-                address_data = ViaCEPAPI.search(self.address.zip_code)
-                if isinstance(address_data, dict):
-                    self.address.street = address_data.get("street")
-                    self.address.neighborhood = address_data.get("neighborhood")
-                    self.address.city = address_data.get("city")
-                    self.address.state = address_data.get("state")
-                    self.address.region = address_data.get("region")
-                    self.address.country = address_data.get("country")
-            except Exception:
-                print("Error fetching address data")
+    undelete_on = ("user",)
 
+    def save(self, *args, **kwargs):
+        loaded_state = getattr(self, "_loaded_search_state", None)
         super().save(*args, **kwargs)
 
+        # Changes of type or soft deletion move the profile in or out of the proximity searches.
+        # Invalidated once committed, so that no reader caches the rows again from before the change
+        search_state = (self.type, self.deleted_at)
+        if loaded_state is not None and loaded_state != search_state and hasattr(self, "address"):
+            point = (self.address.latitude, self.address.longitude)
+            transaction.on_commit(partial(NearbyCache.invalidate, [point]))
+        self._loaded_search_state = search_state
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_search_state = (instance.__dict__.get("type"), instance.__dict__.get("deleted_at"))
+        return instance
+
+    @classmethod
+    def soft_deleted(cls, pks: list) -> None:
+        # Soft deleted profiles leave the proximity searches around their addresses
+        points = list(Address.all_objects.filter(profile_id__in=pks).values_list("latitude", "longitude"))
+        transaction.on_commit(partial(NearbyCache.invalidate, points))
+
     class Meta:
         verbose_name = "perfil"
         verbose_name_plural = "perfis"
         db_table = "profile"
+        indexes = [
+            models.Index(
+                fields=["type", "-created_at"],
+                condition=Q(deleted_at__isnull=True),
+                name="profile_type_live_idx",
+            ),
+        ]
+        # Unique among live profiles only, so that soft deleted profiles do not hold their CPF and phone
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cpf"],
+                condition=Q(deleted_at__isnull=True),
+                name="profile_cpf_live_unique",
+                violation_error_message="Já existe um perfil com este CPF.",
+            ),
+            models.UniqueConstraint(
+                fields=["phone"],
+                condition=Q(deleted_at__isnull=True),
+                name="profile_phone_live_unique",
+                violation_error_message="Já existe um perfil com este telefone.",
+            ),
+        ]
+
+    @staticmethod
+    def _instructors():
+        """Default queryset of the proximity searches."""
+        return Profile.objects.filter(type=Profile.TYPE_INSTRUCTOR, address__deleted_at__isnull=True).order_by(
+            "-created_at"
+        )
+
+    @staticmethod
+    def _rows_within(lat: float, lon: float, radius_km: float, qs) -> np.ndarray:
+        """Query the (id, latitude, longitude) rows of the profiles within a radius from a given point.
+
+        Args:
+            lat (float): Latitude of the center point in decimal degrees.
+            lon (float): Longitude of the center point in decimal degrees.
+            radius_km (float): Search radius in kilometers.
+            qs (models.QuerySet["Profile"]): Base queryset to filter from.
+
+        Returns:
+            np.ndarray: Rows of the profiles within the radius, in the queryset order.
+        """
+        # Pre-filter candidates through the spatial index
+        candidates = get_spatial_index().filter(qs, lat, lon, radius_km)
+        rows = np.array(
+            list(candidates.values_list("pk", "address__latitude", "address__longitude")),
+            dtype=float,
+        ).reshape(-1, 3)
+        return rows[haversine_km_many(lat, lon, rows[:, 1], rows[:, 2]) <= radius_km]
+
+    @staticmethod
+    def _nearby_distances(lat: float, lon: float, radius_km: float, qs=None) -> tuple[np.ndarray, np.ndarray]:
+        """Compute the distances of the profiles within a radius from a given point.
+
+        Searches over the default queryset are answered from 'NearbyCache' when possible.
+
+        Args:
+            lat (float): Latitude of the center point in decimal degrees.
+            lon (float): Longitude of the center point in decimal degrees.
+            radius_km (float): Search radius in kilometers.
+            qs (models.QuerySet["Profile"], optional): Base queryset to filter from. Defaults to None.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: IDs and distances in kilometers of the profiles within the radius.
+        """
+        rows = None
+        if qs is None:
+            rows = NearbyCache.get_rows(
+                lat,
+                lon,
+                radius_km,
+                loader=lambda *args: Profile._rows_within(*args, qs=Profile._instructors()),
+            )
+
+        if rows is None:
+            rows = Profile._rows_within(lat, lon, radius_km, qs if qs is not None else Profile._instructors())
+
+        # Calculate precise distances for all candidates at once
+        distances = haversine_km_many(lat, lon, rows[:, 1], rows[:, 2])
+        within = distances <= radius_km
+        return rows[within, 0].astype(np.int64), distances[within]
+
+    @staticmethod
+    def _build_nearby(ids: np.ndarray, distances: np.ndarray, qs) -> list["Profile"]:
+        """Load the profiles with the given IDs, in that order, annotated with their 'distance_km'.
+
+        IDs no longer matching the queryset, such as stale 'NearbyCache' rows of profiles deleted
+        since, are skipped.
+        """
+        profiles = qs.select_related("user", "address").in_bulk(ids.tolist())
+        result = []
+        for pk, distance in zip(ids.tolist(), distances.tolist()):
+            if (profile := profiles.get(pk)) is None:
+                continue
+            profile.distance_km = round(distance, 3)
+            result.append(profile)
+        return result
 
     @staticmethod
     def find_nearby_instructors(
@@ -71,6 +176,7 @@ class Profile(TimestampedModel, SoftDeleteModel):
         lon: float,
         radius_km: float = 10.0,
         qs=None,
+        order_by_distance: bool = False,
     ) -> list["Profile"]:
         """Find instructors within a certain radius from a given point.
 
@@ -79,35 +185,58 @@ class Profile(TimestampedModel, SoftDeleteModel):
             lon (float): Longitude of the center point in decimal degrees.
             radius_km (float, optional): Search radius in kilometers. Defaults to 10.0.
             qs (models.QuerySet["Profile"], optional): Base queryset to filter from. Defaults to None.
+            order_by_distance (bool, optional): Sort the result from the closest instructor. Defaults to False.
 
         Returns:
-            list["Profile"]: A list of instructors within the specified radius.
+            list["Profile"]: A list of instructors within the specified radius, annotated with 'distance_km'.
         """
+        ids, distances = Profile._nearby_distances(lat, lon, radius_km, qs)
 
-        if qs is None:
-            qs = Profile.objects.filter(type=Profile.TYPE_INSTRUCTOR)
-
-        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
-
-        # Pre-filter candidates within the bounding box
-        candidates = qs.select_related("address").filter(
-            address__latitude__isnull=False,
-            address__longitude__isnull=False,
-            address__latitude__gte=min_lat,
-            address__latitude__lte=max_lat,
-            address__longitude__gte=min_lon,
-            address__longitude__lte=max_lon,
-        )
+        if order_by_distance:
+            order = np.argsort(distances, kind="stable")
+            ids, distances = ids[order], distances[order]
 
-        result = []
-        for profile in candidates:
-            # Calculate precise distance
-            a = profile.address
-            d = haversine_km(lat, lon, a.latitude, a.longitude)
-            if d <= radius_km:
-                result.append(profile)
+        # Build full objects only for the candidates within the radius
+        return Profile._build_nearby(ids, distances, qs if qs is not None else Profile._instructors())
 
-        return result
+    @staticmethod
+    def find_nearest_instructors(
+        lat: float,
+        lon: float,
+        k: int,
+        max_radius_km: float = 10.0,
+        qs=None,
+    ) -> list["Profile"]:
+        """Find the k closest instructors to a given point, sorted by distance.
+
+        The search radius starts at 'NEAREST_SEARCH_INITIAL_RADIUS_KM' and doubles until k instructors
+        are found or 'max_radius_km' is reached, so the full radius result set is never built. Searches
+        over the default queryset answered from 'NearbyCache' skip the growth, as the whole radius is
+        already in memory.
+
+        Args:
+            lat (float): Latitude of the center point in decimal degrees.
+            lon (float): Longitude of the center point in decimal degrees.
+            k (int): Number of instructors to return.
+            max_radius_km (float, optional): Maximum search radius in kilometers. Defaults to 10.0.
+            qs (models.QuerySet["Profile"], optional): Base queryset to filter from. Defaults to None.
+
+        Returns:
+            list["Profile"]: Up to k instructors sorted by distance, annotated with 'distance_km'.
+        """
+        if qs is None and NearbyCache.bucket(max_radius_km) is not None:
+            radius_km = max_radius_km
+        else:
+            radius_km = min(settings.NEAREST_SEARCH_INITIAL_RADIUS_KM, max_radius_km)
+
+        while True:
+            ids, distances = Profile._nearby_distances(lat, lon, radius_km, qs)
+            if len(ids) >= k or radius_km >= max_radius_km:
+                break
+            radius_km = min(radius_km * 2, max_radius_km)
+
+        order = np.argsort(distances, kind="stable")[:k]
+        return Profile._build_nearby(ids[order], distances[order], qs if qs is not None else Profile._instructors())
 
     def __str__(self):
         return self.user.get_full_name()
@@ -115,6 +244,25 @@ class Profile(TimestampedModel, SoftDeleteModel):
 
 class Address(TimestampedModel, SoftDeleteModel):
 
+    GEOCODING_PENDING = "pending"
+    GEOCODING_DONE = "done"
+    GEOCODING_FAILED = "failed"
+    GEOCODING_CHOICES = (
+        (GEOCODING_PENDING, "Pendente"),
+        (GEOCODING_DONE, "Concluída"),
+        (GEOCODING_FAILED, "Falhou"),
+    )
+    GEOCODED_FIELDS = (
+        "latitude",
+        "longitude",
+        "street",
+        "neighborhood",
+        "city",
+        "state",
+        "region",
+        "country",
+    )
+
     # Relations
     profile = models.OneToOneField(
         Profile,
@@ -137,38 +285,175 @@ class Address(TimestampedModel, SoftDeleteModel):
     country = models.CharField(verbose_name="país", max_length=255, blank=True, null=True)
 
     # Fields from geocoding via NominatimAPI
-    latitude = models.FloatField(verbose_name="latitude", db_index=True, blank=True, null=True)
-    longitude = models.FloatField(verbose_name="longitude", db_index=True, blank=True, null=True)
+    latitude = models.FloatField(verbose_name="latitude", blank=True, null=True)
+    longitude = models.FloatField(verbose_name="longitude", blank=True, null=True)
+
+    # Status of the 'geocode_address' task
+    geocoding_status = models.CharField(
+        verbose_name="geocodificação",
+        max_length=10,
+        choices=GEOCODING_CHOICES,
+        default=GEOCODING_PENDING,
+        db_index=True,
+    )
+
+    undelete_on = ("profile",)
 
     class Meta:
         verbose_name = "endereço"
         verbose_name_plural = "endereços"
         db_table = "address"
+        indexes = [
+            models.Index(
+                fields=["latitude", "longitude"],
+                condition=Q(deleted_at__isnull=True, latitude__isnull=False, longitude__isnull=False),
+                name="address_coordinates_live_idx",
+            ),
+        ]
+
+    def needs_geocoding(self) -> bool:
+        """Check whether the coordinates or the address fields are still missing."""
+        return (
+            not self.latitude
+            or not self.longitude
+            or not self.street
+            or not self.neighborhood
+            or not self.city
+            or not self.state
+        )
 
-    def save(self, *args, **kwargs):
-        if not self.latitude or not self.longitude:
+    @staticmethod
+    def resolve_zip_code(zip_code: str, coordinates: bool = True, address_data: bool = True) -> tuple:
+        """Look up a CEP through NominatimAPI and ViaCEPAPI.
+
+        Args:
+            zip_code (str): CEP to be resolved.
+            coordinates (bool, optional): Look up the coordinates. Defaults to True.
+            address_data (bool, optional): Look up the address fields. Defaults to True.
+
+        Returns:
+            tuple: Latitude and longitude as a tuple (or None), the address data as a dictionary (or None)
+                and whether a provider was unavailable, so that the lookup is worth retrying.
+        """
+        lat_lon, data, unavailable = None, None, False
+
+        if coordinates:
             try:
-                lat, lon = NominatimAPI.search(self.zip_code)
+                lat, lon = NominatimAPI.search(zip_code)
                 if isinstance(lat, float) and isinstance(lon, float):
-                    self.latitude = lat
-                    self.longitude = lon
+                    lat_lon = lat, lon
+                else:
+                    unavailable = NominatimAPI.is_failure((lat, lon))
+            except APIUnavailable:
+                unavailable = True
             except Exception:
                 print("Error geocoding address")
+                unavailable = True
 
-        if not self.street or not self.neighborhood or not self.city or not self.state:
+        if address_data:
             try:
-                address_data = ViaCEPAPI.search(self.zip_code)
-                if isinstance(address_data, dict):
-                    self.street = address_data.get("street")
-                    self.neighborhood = address_data.get("neighborhood")
-                    self.city = address_data.get("city")
-                    self.state = address_data.get("state")
-                    self.region = address_data.get("region")
-                    self.country = address_data.get("country")
+                result = ViaCEPAPI.search(zip_code)
+                if isinstance(result, dict):
+                    data = result
+                else:
+                    unavailable = unavailable or ViaCEPAPI.is_failure(result)
+            except APIUnavailable:
+                unavailable = True
             except Exception:
                 print("Error fetching address data")
+                unavailable = True
+
+        return lat_lon, data, unavailable
+
+    def apply_geocoding(self, lat_lon: tuple | None, address_data: dict | None, unavailable: bool = False):
+        """Fill the missing coordinates and address fields from a resolved CEP and update the status.
+
+        The geocoding only fails when the providers answered, it stays pending while they are unavailable.
+
+        Args:
+            lat_lon (tuple or None): Latitude and longitude from NominatimAPI.
+            address_data (dict or None): Address data from ViaCEPAPI.
+            unavailable (bool, optional): Whether a provider was unavailable. Defaults to False.
+        """
+        if lat_lon and (not self.latitude or not self.longitude):
+            self.latitude, self.longitude = lat_lon
+
+        if address_data and (not self.street or not self.neighborhood or not self.city or not self.state):
+            self.street = address_data.get("street")
+            self.neighborhood = address_data.get("neighborhood")
+            self.city = address_data.get("city")
+            self.state = address_data.get("state")
+            self.region = address_data.get("region")
+            self.country = address_data.get("country")
+
+        if not self.needs_geocoding():
+            self.geocoding_status = Address.GEOCODING_DONE
+        elif unavailable:
+            self.geocoding_status = Address.GEOCODING_PENDING
+        else:
+            self.geocoding_status = Address.GEOCODING_FAILED
+
+    def geocode(self):
+        """Fill the missing coordinates and address fields from NominatimAPI and ViaCEPAPI.
+
+        Blocks on the external APIs, so it is meant to run in the 'geocode_address' task.
+        """
+        self.apply_geocoding(
+            *Address.resolve_zip_code(
+                self.zip_code,
+                coordinates=not self.latitude or not self.longitude,
+                address_data=not self.street or not self.neighborhood or not self.city or not self.state,
+            )
+        )
 
+    def save(self, *args, **kwargs):
+        # Geocoding runs in the background, the status tells whether it is still needed
+        zip_code_changed = self.zip_code != getattr(self, "_loaded_zip_code", self.zip_code)
+        if not self.needs_geocoding():
+            self.geocoding_status = Address.GEOCODING_DONE
+        elif zip_code_changed or self.geocoding_status == Address.GEOCODING_DONE:
+            self.geocoding_status = Address.GEOCODING_PENDING
+
+        loaded_state = getattr(self, "_loaded_search_state", None)
         super().save(*args, **kwargs)
+        get_spatial_index().update([self])
+
+        # Invalidate the proximity searches around both the previous and the current coordinates
+        search_state = (self.latitude, self.longitude, self.deleted_at)
+        if loaded_state != search_state:
+            points = [(self.latitude, self.longitude)]
+            if loaded_state is not None:
+                points.append(loaded_state[:2])
+            transaction.on_commit(partial(NearbyCache.invalidate, points))
+        self._loaded_search_state = search_state
+        self._loaded_zip_code = self.zip_code
+
+        # Addresses already pending were enqueued when they became so, the task retries them by itself
+        became_pending = getattr(self, "_loaded_geocoding_status", None) != Address.GEOCODING_PENDING
+        if self.geocoding_status == Address.GEOCODING_PENDING and became_pending:
+            # Imported here as the tasks depend on this module
+            from app.profiles.tasks import geocode_address
+
+            transaction.on_commit(partial(geocode_address.enqueue, address_id=self.pk))
+        self._loaded_geocoding_status = self.geocoding_status
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_search_state = (
+            instance.__dict__.get("latitude"),
+            instance.__dict__.get("longitude"),
+            instance.__dict__.get("deleted_at"),
+        )
+        instance._loaded_zip_code = instance.__dict__.get("zip_code")
+        instance._loaded_geocoding_status = instance.__dict__.get("geocoding_status")
+        return instance
+
+    @classmethod
+    def soft_deleted(cls, pks: list) -> None:
+        # The spatial index keeps soft deleted addresses, which the searches filter out
+        points = list(cls.all_objects.filter(pk__in=pks).values_list("latitude", "longitude"))
+        transaction.on_commit(partial(NearbyCache.invalidate, points))
 
     def format_zip_code(self):
         return re.sub(r"(\d{5})(\d{3})", r"\1-\2", self.zip_code)
@@ -177,3 +462,134 @@ class Address(TimestampedModel, SoftDeleteModel):
         if not self.street:
             return f"{self.format_zip_code()}"
         return f"{self.street}{f', {self.number}' if self.number else ''} - {self.neighborhood}, {self.city} - {self.state}, {self.zip_code}"
+
+
+class ZipCodeLookup(TimestampedModel):
+    """Persistent cache of the CEP lookups made through NominatimAPI and ViaCEPAPI.
+
+    Also holds the CEPs loaded from an offline dataset by the 'import_zip_codes' command,
+    which never expire.
+    """
+
+    SOURCE_NOMINATIM = "nominatim"
+    SOURCE_VIACEP = "viacep"
+
+    ORIGIN_API = "api"
+    ORIGIN_DATASET = "dataset"
+    ORIGIN_CHOICES = (
+        (ORIGIN_API, "API"),
+        (ORIGIN_DATASET, "Base offline"),
+    )
+
+    STATUS_FOUND = "found"
+    STATUS_NOT_FOUND = "not_found"
+    STATUS_CHOICES = (
+        (STATUS_FOUND, "Encontrado"),
+        (STATUS_NOT_FOUND, "Não encontrado"),
+    )
+
+    # Fields
+    zip_code = models.CharField(verbose_name="CEP", unique=True, max_length=20)
+    origin = models.CharField(
+        verbose_name="origem",
+        max_length=10,
+        choices=ORIGIN_CHOICES,
+        default=ORIGIN_API,
+    )
+
+    # Fields from NominatimAPI
+    latitude = models.FloatField(verbose_name="latitude", blank=True, null=True)
+    longitude = models.FloatField(verbose_name="longitude", blank=True, null=True)
+    nominatim_status = models.CharField(
+        verbose_name="status Nominatim",
+        max_length=10,
+        choices=STATUS_CHOICES,
+        blank=True,
+        null=True,
+    )
+    nominatim_fetched_at = models.DateTimeField(verbose_name="consultado no Nominatim em", blank=True, null=True)
+
+    # Fields from ViaCEPAPI
+    street = models.CharField(verbose_name="logradouro", max_length=255, blank=True, null=True)
+    neighborhood = models.CharField(verbose_name="bairro", max_length=255, blank=True, null=True)
+    city = models.CharField(verbose_name="cidade", max_length=255, blank=True, null=True)
+    state = models.CharField(verbose_name="estado", max_length=255, blank=True, null=True)
+    region = models.CharField(verbose_name="região", max_length=255, blank=True, null=True)
+    country = models.CharField(verbose_name="país", max_length=255, blank=True, null=True)
+    viacep_status = models.CharField(
+        verbose_name="status ViaCEP",
+        max_length=10,
+        choices=STATUS_CHOICES,
+        blank=True,
+        null=True,
+    )
+    viacep_fetched_at = models.DateTimeField(verbose_name="consultado no ViaCEP em", blank=True, null=True)
+
+    class Meta:
+        verbose_name = "consulta de CEP"
+        verbose_name_plural = "consultas de CEP"
+        db_table = "zip_code_lookup"
+
+    @staticmethod
+    def normalize(zip_code: str) -> str:
+        """Keep only the digits of a CEP."""
+        return re.sub(r"\D", "", str(zip_code))
+
+    @classmethod
+    def get_fresh(cls, zip_code: str, source: str) -> "ZipCodeLookup | None":
+        """Get the cached lookup of a CEP if the given source answered it within its TTL.
+
+        Args:
+            zip_code (str): CEP to be consulted.
+            source (str): Either SOURCE_NOMINATIM or SOURCE_VIACEP.
+
+        Returns:
+            ZipCodeLookup or None: Cached lookup, None on a miss or if expired.
+        """
+        lookup = cls.objects.filter(zip_code=cls.normalize(zip_code)).first()
+        if lookup is None:
+            return None
+
+        status = getattr(lookup, f"{source}_status")
+        fetched_at = getattr(lookup, f"{source}_fetched_at")
+        if status is None or fetched_at is None:
+            return None
+
+        # Entries from the offline dataset never expire
+        if lookup.origin == cls.ORIGIN_DATASET:
+            return lookup
+
+        ttl = settings.ZIP_CODE_LOOKUP_TTL if status == cls.STATUS_FOUND else settings.ZIP_CODE_LOOKUP_NEGATIVE_TTL
+        if fetched_at + ttl < timezone.now():
+            return None
+        return lookup
+
+    @classmethod
+    def store(cls, zip_code: str, source: str, status: str, **fields) -> "ZipCodeLookup":
+        """Store the answer of a source for a CEP.
+
+        The lookup is flagged as coming from the API again, so that it expires even when it was
+        first imported from the offline dataset.
+
+        Args:
+            zip_code (str): CEP consulted.
+            source (str): Either SOURCE_NOMINATIM or SOURCE_VIACEP.
+            status (str): Either STATUS_FOUND or STATUS_NOT_FOUND.
+            **fields: Data returned by the source.
+
+        Returns:
+            ZipCodeLookup: Updated lookup.
+        """
+        lookup, _ = cls.objects.update_or_create(
+            zip_code=cls.normalize(zip_code),
+            defaults={
+                **fields,
+                "origin": cls.ORIGIN_API,
+                f"{source}_status": status,
+                f"{source}_fetched_at": timezone.now(),
+            },
+        )
+        return lookup
+
+    def __str__(self):
+        return self.zip_code
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
@@ -53,7 +54,7 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     # Custom fields
     def phone_formatted(self, obj):
-        return format_phone(self, obj)
+        return format_phone(obj)
 
     class Meta:
         model = Profile
@@ -66,6 +67,10 @@ class ProfileSerializer(serializers.ModelSerializer):
         )
 
 
+class NearbyProfileSerializer(ProfileSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+
+
 class SimpleProfileSerializer(serializers.ModelSerializer):
 
     user = UserSerializer(many=False, read_only=True)
@@ -84,13 +89,15 @@ class SimpleProfileSerializer(serializers.ModelSerializer):
 
     # Custom fields
     def phone_formatted(self, obj):
-        return format_phone(self, obj)
+        return format_phone(obj)
 
 
 class SearchProfileSerializer(serializers.Serializer):
     lat = serializers.CharField()
     lon = serializers.CharField()
     radius_km = serializers.FloatField(default=10.0)
+    k = serializers.IntegerField(min_value=1, max_value=settings.NEAREST_SEARCH_MAX_K, required=False)
+    order = serializers.ChoiceField(choices=("-created_at", "distance"), default="-created_at")
 
     # Validators
     def validate_lat(self, value):
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from app.profiles.cache import NearbyCache
+from app.profiles.models import Address
+from app.profiles.spatial import get_spatial_index
+
+
+@receiver(post_delete, sender=Address)
+def remove_deleted_address(sender, instance: Address, **kwargs):
+    """Drop a hard deleted address from the spatial index and the proximity searches.
+
+    Runs for cascades and queryset deletes too, unlike 'Address.delete'.
+    """
+    get_spatial_index().remove([instance.pk])
+    point = (instance.latitude, instance.longitude)
+    transaction.on_commit(lambda: NearbyCache.invalidate([point]))
@@ -0,0 +1,143 @@
+from functools import cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from app.utils import bounding_box
+
+
+class BaseSpatialIndex:
+    """Base class for spatial index backends over the 'address' table.
+
+    A backend narrows a Profile queryset down to the candidates whose address may lie within
+    a radius of a point. The result is a superset: callers still refine it with the exact
+    great-circle distance.
+    """
+
+    def filter(self, qs, lat: float, lon: float, radius_km: float):
+        """Narrow a Profile queryset to candidates near the given point.
+
+        Args:
+            qs (models.QuerySet["Profile"]): Base queryset to filter from.
+            lat (float): Latitude of the center point in decimal degrees.
+            lon (float): Longitude of the center point in decimal degrees.
+            radius_km (float): Search radius in kilometers.
+
+        Returns:
+            models.QuerySet["Profile"]: Candidates with coordinates near the given point.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        return qs.filter(
+            address__latitude__isnull=False,
+            address__longitude__isnull=False,
+            address__latitude__gte=min_lat,
+            address__latitude__lte=max_lat,
+            address__longitude__gte=min_lon,
+            address__longitude__lte=max_lon,
+        )
+
+    def update(self, addresses) -> None:
+        """Synchronize the index entries of the given addresses."""
+
+    def remove(self, address_ids) -> None:
+        """Drop the index entries of the given address IDs."""
+
+    def rebuild(self) -> None:
+        """Rebuild the whole index from the 'address' table."""
+
+
+class BoundingBoxIndex(BaseSpatialIndex):
+    """Fallback backend relying on the B-tree indexes of 'latitude' and 'longitude'."""
+
+
+class SQLiteRTreeIndex(BaseSpatialIndex):
+    """SQLite backend using the 'address_rtree' R*Tree virtual table.
+
+    The table is not maintained by the database itself, so it is kept in sync on 'Address.save'
+    and, for hard deletes, by the 'post_delete' receiver of 'app.profiles.signals'. Bulk writes
+    bypass both: 'bulk_create', 'bulk_update' and 'QuerySet.update' of coordinates must call
+    'update' on the written addresses, or be followed by the 'rebuild_spatial_index' command.
+    """
+
+    table = "address_rtree"
+
+    def filter(self, qs, lat: float, lon: float, radius_km: float):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        return qs.filter(
+            address__latitude__isnull=False,
+            address__longitude__isnull=False,
+            address__id__in=RawSQL(
+                f"SELECT id FROM {self.table} WHERE max_lat >= %s AND min_lat <= %s AND max_lon >= %s AND min_lon <= %s",
+                (min_lat, max_lat, min_lon, max_lon),
+            ),
+        )
+
+    def update(self, addresses) -> None:
+        located, missing = [], []
+        for address in addresses:
+            if address.latitude is None or address.longitude is None:
+                missing.append(address.pk)
+            else:
+                located.append((address.pk, address.latitude, address.latitude, address.longitude, address.longitude))
+
+        with connection.cursor() as cursor:
+            if located:
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (id, min_lat, max_lat, min_lon, max_lon) VALUES (%s, %s, %s, %s, %s)",
+                    located,
+                )
+            if missing:
+                cursor.executemany(f"DELETE FROM {self.table} WHERE id = %s", [(pk,) for pk in missing])
+
+    def remove(self, address_ids) -> None:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE id = %s", [(pk,) for pk in address_ids])
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (id, min_lat, max_lat, min_lon, max_lon) "
+                "SELECT id, latitude, latitude, longitude, longitude FROM address "
+                "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+            )
+
+
+class PostgresEarthDistanceIndex(BaseSpatialIndex):
+    """PostgreSQL backend using the GiST index on 'll_to_earth(latitude, longitude)'.
+
+    Requires the 'cube' and 'earthdistance' extensions. The index is an expression index,
+    so PostgreSQL keeps it in sync by itself.
+    """
+
+    def filter(self, qs, lat: float, lon: float, radius_km: float):
+        # earthdistance models the Earth with its own radius (earth(), in meters), so the radius
+        # is scaled to cover the same angular distance as EARTH_RADIUS_KM does
+        return qs.filter(
+            address__latitude__isnull=False,
+            address__longitude__isnull=False,
+            address__id__in=RawSQL(
+                "SELECT id FROM address "
+                "WHERE earth_box(ll_to_earth(%s, %s), %s * earth() / %s) @> ll_to_earth(latitude, longitude)",
+                (lat, lon, radius_km, settings.EARTH_RADIUS_KM),
+            ),
+        )
+
+
+BACKENDS = {
+    "sqlite": SQLiteRTreeIndex,
+    "postgresql": PostgresEarthDistanceIndex,
+}
+
+
+@cache
+def get_spatial_index() -> BaseSpatialIndex:
+    """Return the spatial index backend configured in 'SPATIAL_INDEX_BACKEND'.
+
+    Falls back to the backend matching the database vendor when the setting is empty.
+    """
+    if settings.SPATIAL_INDEX_BACKEND:
+        return import_string(settings.SPATIAL_INDEX_BACKEND)()
+    return BACKENDS.get(connection.vendor, BoundingBoxIndex)()
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.tasks import task
+from django.utils import timezone
+
+from app.profiles.models import Address
+
+
+@task()
+def geocode_address(address_id: int, attempt: int = 1) -> str | None:
+    """Fill the coordinates and address fields of an address from its CEP.
+
+    While the providers are unavailable the address stays pending, and the task is retried with
+    an exponential backoff up to 'GEOCODING_TASK_MAX_ATTEMPTS' times.
+
+    Args:
+        address_id (int): ID of the address to be geocoded.
+        attempt (int, optional): Number of this attempt, starting at 1. Defaults to 1.
+
+    Returns:
+        str or None: Resulting geocoding status, None if the address no longer exists.
+    """
+    address = Address.objects.filter(pk=address_id).first()
+    if address is None:
+        return None
+
+    if address.needs_geocoding():
+        address.geocode()
+
+    address.save(update_fields=[*Address.GEOCODED_FIELDS, "geocoding_status", "updated_at"])
+
+    if address.geocoding_status == Address.GEOCODING_PENDING and attempt < settings.GEOCODING_TASK_MAX_ATTEMPTS:
+        delay = settings.GEOCODING_TASK_RETRY_DELAY * 2 ** (attempt - 1)
+        geocode_address.using(run_after=timezone.now() + timedelta(seconds=delay)).enqueue(
+            address_id=address_id, attempt=attempt + 1
+        )
+    return address.geocoding_status
@@ -1,3 +1,256 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from app.profiles import tasks
+from app.profiles.cache import NearbyCache
+from app.profiles.models import Address, Profile, ZipCodeLookup
+from app.profiles.serializers import ProfileSerializer, SimpleProfileSerializer
+from app.profiles.views import ProfileViewSet
+from app.serializers import CompiledSerializer
+from app.utils import format_phone
+
+
+class CompiledProfileSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            [User(username=f"user{i}", first_name=f"Nome {i}", email=f"user{i}@example.com") for i in range(3)]
+        )
+        profiles = Profile.objects.bulk_create(
+            [
+                Profile(
+                    user=user,
+                    type=(Profile.TYPE_CLIENT, Profile.TYPE_INSTRUCTOR)[i % 2],
+                    cpf=f"{i:011d}",
+                    phone=("21999999999", "2133334444", "999")[i],
+                    birthdate=date(1990 + i, 1, 31),
+                )
+                for i, user in enumerate(users)
+            ]
+        )
+        Address.objects.bulk_create(
+            [
+                Address(
+                    profile=profile,
+                    zip_code=f"2000000{i}",
+                    street="Rua da Assembleia",
+                    neighborhood="Centro",
+                    city="Rio de Janeiro",
+                    state="RJ",
+                    region="Sudeste",
+                    country="Brasil",
+                )
+                for i, profile in enumerate(profiles)
+            ]
+        )
+
+    def assertRendersLike(self, serializer_class, queryset):
+        compiled = CompiledSerializer(serializer_class(), queryset)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(list(compiled.serialize(compiled.rows(queryset)))), expected)
+
+    def test_profile_serializer(self):
+        self.assertRendersLike(ProfileSerializer, ProfileViewSet.queryset.order_by("pk"))
+
+    def test_simple_profile_serializer(self):
+        self.assertRendersLike(SimpleProfileSerializer, Profile.objects.select_related("user").order_by("pk"))
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_list_endpoint(self):
+        response = self.client.get("/api/profiles/")
+        with mock.patch.object(ProfileViewSet, "compile_list_serializer", False):
+            expected = self.client.get("/api/profiles/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+
+    def test_unsupported_method_field(self):
+        class Serializer(SimpleProfileSerializer):
+            initials = serializers.SerializerMethodField()
+
+            class Meta(SimpleProfileSerializer.Meta):
+                fields = ("initials",)
+
+            def get_initials(self, obj):
+                return obj.user.first_name[:1]
+
+        with self.assertRaises(TypeError):
+            CompiledSerializer(Serializer(), Profile.objects.all())
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_sparse_fieldset(self):
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled), mock.patch.object(ProfileViewSet, "compile_list_serializer", compiled):
+                response = self.client.get("/api/profiles/", {"fields": "phone,user.first_name"})
+                unknown = self.client.get("/api/profiles/", {"fields": "phone", "expand": "user.nope"})
+                self.assertEqual(
+                    response.json()["results"][0],
+                    {"user": {"first_name": "Nome 2"}, "phone": "999"},
+                )
+                self.assertEqual(unknown.status_code, 400)
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_sparse_fieldset_query(self):
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled), mock.patch.object(ProfileViewSet, "compile_list_serializer", compiled):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get("/api/profiles/", {"fields": "phone,user.first_name"})
+                # The count of the pagination, then the page
+                self.assertEqual(len(queries), 2)
+                self.assertIn('"auth_user"."first_name"', queries[1]["sql"])
+                for unread in ('"auth_user"."email"', '"profile"."cpf"', '"address"'):
+                    self.assertNotIn(unread, queries[1]["sql"])
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_sparse_fieldset_retrieve(self):
+        profile = Profile.objects.get(phone="2133334444")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/profiles/{profile.pk}/", {"fields": "phone,address.city"})
+        self.assertEqual(response.json(), {"address": {"city": "Rio de Janeiro"}, "phone": format_phone(profile)})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"auth_user"', queries[0]["sql"])
+        self.assertNotIn('"address"."street"', queries[0]["sql"])
+
+
+class SoftDeletedUniqueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([User(username=f"user{i}") for i in range(3)])
+        cls.deleted, cls.live = Profile.objects.bulk_create(
+            [
+                Profile(
+                    user=user,
+                    type=Profile.TYPE_CLIENT,
+                    cpf=cpf,
+                    phone=phone,
+                    birthdate=date(1990, 1, 31),
+                )
+                for user, cpf, phone in zip(cls.users, ("11111111111", "22222222222"), ("21999999999", "2133334444"))
+            ]
+        )
+        cls.deleted.delete()
+
+    def test_cpf_and_phone_reuse(self):
+        class Serializer(serializers.ModelSerializer):
+            class Meta:
+                model = Profile
+                fields = ("cpf", "phone")
+
+        reused = Serializer(data={"cpf": self.deleted.cpf, "phone": self.deleted.phone})
+        taken = Serializer(data={"cpf": self.live.cpf, "phone": self.live.phone})
+        self.assertTrue(reused.is_valid(), reused.errors)
+        self.assertFalse(taken.is_valid())
+        self.assertEqual(set(taken.errors), {"cpf", "phone"})
+
+        # A soft deleted profile does not hold its CPF and phone, a live one does
+        profile = Profile(user=self.users[2], type=Profile.TYPE_CLIENT, birthdate=date(1990, 1, 31))
+        for field, value in reused.validated_data.items():
+            setattr(profile, field, value)
+        profile.full_clean()
+        profile.save()
+        profile.cpf = self.live.cpf
+        with self.assertRaises(ValidationError):
+            profile.full_clean()
+
+    def test_profile_readd(self):
+        profile = Profile(user=self.users[0], type=Profile.TYPE_INSTRUCTOR, cpf="33333333333", phone="999")
+        profile.birthdate = date(2000, 1, 1)
+        profile.full_clean()
+        profile.save()
+
+        # The soft deleted profile of the user is taken over
+        self.assertEqual(profile.pk, self.deleted.pk)
+        self.assertEqual(Profile.all_objects.filter(user=self.users[0]).count(), 1)
+        self.assertEqual(Profile.objects.get(user=self.users[0]).cpf, "33333333333")
+
+    def test_address_readd(self):
+        fields = {"street": "Rua da Assembleia", "neighborhood": "Centro", "city": "Rio de Janeiro", "state": "RJ"}
+        old = Address.objects.create(profile=self.live, zip_code="20011000", latitude=-22.9, longitude=-43.2, **fields)
+        old.delete()
+
+        address = Address(profile=self.live, zip_code="20040002", latitude=-22.91, longitude=-43.18, **fields)
+        address.full_clean()
+        address.save()
+
+        address = Address.objects.get(profile=self.live)
+        self.assertEqual((address.pk, address.zip_code), (old.pk, "20040002"))
+        self.assertGreater(address.created_at, old.created_at)
+
+
+@override_settings(GEOCODING_OFFLINE=True)
+class GeocodeAddressTaskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        profile = Profile.objects.create(
+            user=User.objects.create(username="user"),
+            type=Profile.TYPE_CLIENT,
+            cpf="11111111111",
+            phone="21999999999",
+            birthdate=date(1990, 1, 31),
+        )
+        cls.address = Address.objects.create(profile=profile, zip_code="20040002")
+
+    def geocode(self, attempt: int = 1) -> tuple:
+        task = tasks.geocode_address
+        with mock.patch.object(tasks, "geocode_address") as retry:
+            status = task.call(address_id=self.address.pk, attempt=attempt)
+        return status, retry
+
+    def test_unavailable(self):
+        # Offline, the CEP cannot be resolved yet
+        status, retry = self.geocode()
+        self.assertEqual(status, Address.GEOCODING_PENDING)
+        retry.using.return_value.enqueue.assert_called_once_with(address_id=self.address.pk, attempt=2)
+
+        with override_settings(GEOCODING_TASK_MAX_ATTEMPTS=2):
+            status, retry = self.geocode(attempt=2)
+        self.assertEqual(status, Address.GEOCODING_PENDING)
+        retry.using.assert_not_called()
+
+    def test_not_found(self):
+        for source in (ZipCodeLookup.SOURCE_NOMINATIM, ZipCodeLookup.SOURCE_VIACEP):
+            ZipCodeLookup.store(self.address.zip_code, source, ZipCodeLookup.STATUS_NOT_FOUND)
+
+        status, retry = self.geocode()
+        self.assertEqual(status, Address.GEOCODING_FAILED)
+        retry.using.assert_not_called()
+
+
+class NearbyCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = Profile.objects.create(
+            user=User.objects.create(username="user"),
+            type=Profile.TYPE_CLIENT,
+            cpf="11111111111",
+            phone="21999999999",
+            birthdate=date(1990, 1, 31),
+        )
+        Address.objects.create(profile=cls.profile, zip_code="20040002", latitude=-22.9, longitude=-43.2)
+
+    def test_on_commit(self):
+        profile = Profile.objects.select_related("address").get(pk=self.profile.pk)
+        with mock.patch.object(NearbyCache, "invalidate") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.type = Profile.TYPE_INSTRUCTOR
+                profile.save()
+                invalidate.assert_not_called()
+        invalidate.assert_called_once_with([(-22.9, -43.2)])
+
+    def test_rollback(self):
+        profile = Profile.objects.select_related("address").get(pk=self.profile.pk)
+        with mock.patch.object(NearbyCache, "invalidate") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    profile.type = Profile.TYPE_INSTRUCTOR
+                    profile.save()
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+        invalidate.assert_not_called()
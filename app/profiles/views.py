@@ -7,6 +7,7 @@ from rest_framework.response import Response
 from app.profiles.models import Address, Profile
 from app.profiles.serializers import (
     AddressSerializer,
+    NearbyProfileSerializer,
     ProfileSerializer,
     SearchProfileSerializer,
 )
@@ -28,6 +29,12 @@ class ProfileViewSet(BaseModelViewSet):
         "phone",
         "birthdate",
     ]
+    compile_list_serializer = True
+
+    def get_serializer_class(self):
+        if self.action == "search":
+            return NearbyProfileSerializer
+        return super().get_serializer_class()
 
     @swagger_auto_schema(
         manual_parameters=[
@@ -53,7 +60,24 @@ class ProfileViewSet(BaseModelViewSet):
                 required=False,
                 default=10.0,
             ),
+            openapi.Parameter(
+                "k",
+                openapi.IN_QUERY,
+                description="Return only the k closest instructors, sorted by distance (radius_km is the maximum radius)",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                "order",
+                openapi.IN_QUERY,
+                description="Result order",
+                type=openapi.TYPE_STRING,
+                enum=["-created_at", "distance"],
+                required=False,
+                default="-created_at",
+            ),
         ],
+        responses={status.HTTP_200_OK: NearbyProfileSerializer(many=True)},
     )
     @action(
         detail=False,
@@ -62,15 +86,26 @@ class ProfileViewSet(BaseModelViewSet):
         url_name="search",
     )
     def search(self, request, *args, **kwargs):
-        """Search instructors by proximity given lat, lon, and radius_km query params."""
+        """Search instructors by proximity given lat, lon, and radius_km query params.
+
+        With k, only the k closest instructors are returned, sorted by distance and unpaginated.
+        """
         params = SearchProfileSerializer(data=request.query_params)
         params.is_valid(raise_exception=True)
 
-        instructors = Profile.find_nearby_instructors(
-            lat=float(params.validated_data["lat"]),
-            lon=float(params.validated_data["lon"]),
-            radius_km=float(params.validated_data["radius_km"]),
-        )
+        lat = float(params.validated_data["lat"])
+        lon = float(params.validated_data["lon"])
+        radius_km = float(params.validated_data["radius_km"])
+
+        if k := params.validated_data.get("k"):
+            instructors = Profile.find_nearest_instructors(lat=lat, lon=lon, k=k, max_radius_km=radius_km)
+        else:
+            instructors = Profile.find_nearby_instructors(
+                lat=lat,
+                lon=lon,
+                radius_km=radius_km,
+                order_by_distance=params.validated_data["order"] == "distance",
+            )
 
         # No instructors found
         if not instructors:
@@ -79,6 +114,11 @@ class ProfileViewSet(BaseModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        # The k closest instructors are already a single page
+        if k:
+            serializer = self.get_serializer(instructors, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
         # Paginate results
         if page := self.paginate_queryset(instructors):
             serializer = self.get_serializer(page, many=True)
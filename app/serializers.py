@@ -0,0 +1,435 @@
+from functools import lru_cache
+from itertools import islice
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+from rest_framework import fields, relations, serializers
+from rest_framework.exceptions import ValidationError
+
+# Fields whose representation is a plain conversion of the column value, the other fields call
+# their own 'to_representation'. Strings are returned as read.
+CONVERTERS = {
+    fields.CharField: None,
+    fields.EmailField: None,
+    fields.IntegerField: int,
+    fields.FloatField: float,
+    fields.BooleanField: bool,
+}
+
+
+class RowView:
+    """Attribute access to the columns of one object of a row, as given to SerializerMethodField."""
+
+    __slots__ = ("row", "prefix")
+
+    def __init__(self, row, prefix: str):
+        self.row = row
+        self.prefix = prefix
+
+    def __getattr__(self, name: str):
+        return getattr(self.row, self.prefix + name)
+
+
+class CompiledSerializer:
+    """Read-only serializer compiled into a function of 'values_list(named=True)' rows.
+
+    The fields of the serializer are walked once to list the columns to read, joins included, and
+    to generate the source of a function turning a row into the same dict as 'to_representation',
+    without building model instances. Supported fields are:
+
+    - Model fields and queryset annotations, converted like the serializer field does.
+    - Nested serializers, read through joins.
+    - Nested serializers with many=True over a reverse foreign key, at the top level only. They are
+      read with one query per batch of rows, honouring a 'Prefetch' of the queryset, sliced or not.
+    - PrimaryKeyRelatedField and SlugRelatedField.
+    - SerializerMethodField named after a model field: the method gets an object exposing that field.
+
+    Args:
+        serializer (serializers.Serializer): Serializer to compile, its context is not used.
+        queryset (models.QuerySet): Queryset the rows are read from, for its model and prefetches.
+        parent (str, optional): Foreign key to the parent rows, for nested many=True serializers.
+        required (tuple, optional): Other columns to read, such as the ones read by a pagination.
+
+    Raises:
+        TypeError: When the serializer has a field that cannot be compiled.
+    """
+
+    batch_size = 100
+
+    def __init__(self, serializer, queryset, parent: str | None = None, required: tuple = ()):
+        self.queryset = queryset
+        self.parent = parent
+        self.paths = {"pk": 0}
+        self.children = []
+        self.constants = {}
+
+        for path in (parent, *required) if parent is not None else required:
+            self.column(path)
+        expression = self.compile(serializer, queryset.model, "")
+        namespace = {"RowView": RowView, **self.constants}
+        exec(f"def build(row, children):\n    return {expression}\n", namespace)
+        self.build = namespace["build"]
+
+    def column(self, path: str) -> int:
+        """Index of a column in the rows, adding it to the columns read when missing."""
+        return self.paths.setdefault(path, len(self.paths))
+
+    def constant(self, value) -> str:
+        name = f"c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def compile(self, serializer, model, prefix: str) -> str:
+        """Source of a dict display building the representation of the object at 'prefix'."""
+        items = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            items.append(f"{name!r}: {self.compile_field(field, model, prefix)}")
+        return "{" + ", ".join(items) + "}"
+
+    def compile_field(self, field, model, prefix: str) -> str:
+        if isinstance(field, serializers.SerializerMethodField):
+            try:
+                model._meta.get_field(field.field_name)
+            except FieldDoesNotExist:
+                raise TypeError(f"Method field '{field.field_name}' is not named after a field of {model.__name__}.")
+            self.column(prefix + field.field_name)
+            method = getattr(field.parent, field.method_name)
+            return f"{self.constant(method)}(RowView(row, {prefix!r}))"
+
+        if field.source == "*" or isinstance(field, relations.ManyRelatedField):
+            raise TypeError(f"Field '{field.field_name}' of type {type(field).__name__} cannot be compiled.")
+        path = prefix + "__".join(field.source_attrs)
+
+        if isinstance(field, serializers.ListSerializer):
+            if prefix:
+                raise TypeError(f"Nested list '{field.field_name}' is only supported at the top level.")
+            self.children.append(self.compile_children(field))
+            return f"children[{len(self.children) - 1}].get(row[0], [])"
+
+        if isinstance(field, serializers.BaseSerializer):
+            related = model
+            for attr in field.source_attrs:
+                related = related._meta.get_field(attr).related_model
+            index = self.column(path + "__pk")
+            return f"(None if row[{index}] is None else {self.compile(field, related, path + '__')})"
+
+        if isinstance(field, relations.SlugRelatedField):
+            path, converter = f"{path}__{field.slug_field}", None
+        elif isinstance(field, relations.PrimaryKeyRelatedField):
+            converter = field.pk_field.to_representation if field.pk_field is not None else None
+        elif isinstance(field, fields.UUIDField) and field.uuid_format == "hex_verbose":
+            converter = str
+        else:
+            converter = CONVERTERS.get(type(field), field.to_representation)
+
+        index = self.column(path)
+        if converter is None:
+            return f"row[{index}]"
+        return f"(None if row[{index}] is None else {self.constant(converter)}(row[{index}]))"
+
+    def compile_children(self, field) -> "CompiledSerializer":
+        prefetch = next(
+            (
+                lookup
+                for lookup in self.queryset._prefetch_related_lookups
+                if isinstance(lookup, Prefetch) and lookup.prefetch_to == field.source
+            ),
+            None,
+        )
+        relation = self.queryset.model._meta.get_field(prefetch.prefetch_through if prefetch else field.source)
+        if not relation.one_to_many:
+            raise TypeError(f"Nested list '{field.field_name}' is not a reverse foreign key.")
+
+        if prefetch is not None and prefetch.queryset is not None:
+            queryset = prefetch.queryset
+        else:
+            queryset = relation.related_model._default_manager.all()
+        return CompiledSerializer(field.child, queryset, parent=relation.field.name)
+
+    def rows(self, queryset):
+        """Turn a queryset of the compiled model into a queryset of the rows read by 'serialize'."""
+        return queryset.prefetch_related(None).values_list(*self.paths, named=True)
+
+    def serialize(self, rows):
+        """Representations of the rows, computed in batches reading the nested lists of each batch.
+
+        Args:
+            rows (Iterable[tuple]): Rows returned by a queryset given to 'rows'.
+
+        Yields:
+            dict: Representation of each row, identical to the one of the serializer.
+        """
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            children = [child.fetch([row[0] for row in batch]) for child in self.children]
+            for row in batch:
+                yield self.build(row, children)
+
+    def fetch(self, parent_ids: list) -> dict:
+        """Representations of the children of the given parents, grouped by parent id."""
+        queryset = self.queryset.all()
+        low_mark, high_mark = queryset.query.low_mark, queryset.query.high_mark
+        queryset.query.clear_limits()
+
+        # A sliced prefetch keeps that slice of the children of each parent, like Django does
+        predicate = Q(**{f"{self.parent}__in": parent_ids})
+        if low_mark or high_mark is not None:
+            compiler = queryset.query.get_compiler(using=queryset._db or DEFAULT_DB_ALIAS)
+            window = Window(
+                RowNumber(),
+                partition_by=self.parent,
+                order_by=[expression for expression, _ in compiler.get_order_by()],
+            )
+            predicate &= GreaterThan(window, low_mark)
+            if high_mark is not None:
+                predicate &= LessThanOrEqual(window, high_mark)
+
+        rows = list(self.rows(queryset.filter(predicate)))
+        index, grouped = self.paths[self.parent], {}
+        for row, representation in zip(rows, self.serialize(rows)):
+            grouped.setdefault(row[index], []).append(representation)
+        return grouped
+
+
+# Sparse fieldsets
+def parse_field_paths(value: str) -> dict:
+    """Parse comma separated dotted field paths into a tree.
+
+    Example:
+        >>> parse_field_paths("uuid,user.first_name,user.email")
+        {'uuid': {}, 'user': {'first_name': {}, 'email': {}}}
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def format_field_paths(tree: dict, prefix: str = "") -> str:
+    """Format a tree of field paths back into sorted comma separated dotted paths.
+
+    Example:
+        >>> format_field_paths(parse_field_paths("user.email, uuid,user.first_name,"))
+        'user.email,user.first_name,uuid'
+    """
+    return ",".join(
+        format_field_paths(subtree, f"{prefix}{name}.") if subtree else prefix + name
+        for name, subtree in sorted(tree.items())
+    )
+
+
+def nested_serializer(field) -> serializers.BaseSerializer | None:
+    """Serializer of the objects of a nested serializer field, None for the other fields."""
+    nested = field.child if isinstance(field, serializers.ListSerializer) else field
+    return nested if isinstance(nested, serializers.BaseSerializer) else None
+
+
+def select_fields(serializer, fields: dict | None, expand: dict, param: str = "") -> None:
+    """Remove from a serializer, in place, the fields not selected by a sparse fieldset.
+
+    With 'fields', only the fields listed, or listed in 'expand', are kept. Without it, as for a
+    nested serializer listed with no subfields, only its own fields are kept, its nested
+    serializers being dropped unless listed in 'expand'. A nested serializer listed in 'expand'
+    without subfields is kept whole.
+
+    Args:
+        serializer (serializers.Serializer): Serializer to trim, the child of a list serializer.
+        fields (dict | None): Tree of the fields to keep, see 'parse_field_paths'.
+        expand (dict): Tree of the nested serializers to keep.
+        param (str, optional): Dotted path of the serializer, for error messages.
+
+    Raises:
+        ValidationError: When a field listed does not exist, or has no fields of its own.
+    """
+    for name, tree in (("fields", fields or {}), ("expand", expand)):
+        unknown = [f"{param}{field}" for field in tree if field not in serializer.fields]
+        unknown += [
+            f"{param}{field}.{subfield}"
+            for field, subtree in tree.items()
+            if field in serializer.fields and nested_serializer(serializer.fields[field]) is None
+            for subfield in subtree
+        ]
+        if unknown:
+            raise ValidationError({name: f"Unknown fields: {', '.join(unknown)}."})
+
+    for name, field in list(serializer.fields.items()):
+        nested = nested_serializer(field)
+
+        if name in expand or (name in fields if fields is not None else nested is None):
+            if nested is not None and (expand.get(name) or (fields or {}).get(name) or name not in expand):
+                select_fields(nested, (fields or {}).get(name) or None, expand.get(name, {}), f"{param}{name}.")
+        else:
+            serializer.fields.pop(name)
+
+
+def read_paths(
+    serializer,
+    model,
+    aliases: dict,
+    prefix: str = "",
+    columns=None,
+    relations=None,
+    annotations=None,
+) -> tuple | None:
+    """Model columns, relation paths and annotations a serializer reads, None when some field is opaque.
+
+    A field is opaque when what it reads cannot be known, such as a SerializerMethodField not named
+    after a model field. Fields that are not model fields are taken for annotations.
+
+    Args:
+        serializer (serializers.Serializer): Serializer reading the model.
+        model (type[models.Model]): Model read.
+        aliases (dict): Relation of the 'to_attr' paths of the prefetches, by path.
+        prefix (str, optional): Path of the model from the queryset's model.
+
+    Returns:
+        tuple[list, set, set] | None: Columns for 'only()', relations for 'select_related()' and
+            'prefetch_related()' and annotations, all as '__' separated paths.
+    """
+    columns = [] if columns is None else columns
+    relations = set() if relations is None else relations
+    annotations = set() if annotations is None else annotations
+    for name, field in serializer.fields.items():
+        many = isinstance(field, serializers.ListSerializer)
+        nested = field.child if many else field
+        if isinstance(field, serializers.SerializerMethodField):
+            source = name
+        elif field.source == "*" or (len(field.source_attrs) > 1 and not isinstance(nested, serializers.BaseSerializer)):
+            return None
+        else:
+            source = "__".join(field.source_attrs)
+
+        try:
+            model_field = model._meta.get_field(aliases.get(prefix + source, source).split("__")[0])
+        except FieldDoesNotExist:
+            if isinstance(field, serializers.SerializerMethodField) or isinstance(nested, serializers.BaseSerializer):
+                return None
+            annotations.add(prefix + source)
+            continue
+
+        if not isinstance(nested, serializers.BaseSerializer):
+            if model_field.concrete:
+                columns.append(prefix + source)
+            continue
+
+        relations.add(prefix + source)
+        if many:
+            # Read by a separate query, whose columns are left alone
+            paths = read_paths(
+                nested, model_field.related_model, aliases, f"{prefix}{source}__", [], relations, annotations
+            )
+        else:
+            if model_field.concrete:
+                columns.append(prefix + source)
+            paths = read_paths(
+                nested, model_field.related_model, aliases, f"{prefix}{source}__", columns, relations, annotations
+            )
+        if paths is None:
+            return None
+    return columns, relations, annotations
+
+
+def shape_queryset(queryset, serializer, required: tuple = ()):
+    """Restrict a queryset to what a serializer reads.
+
+    The 'select_related()' and 'prefetch_related()' lookups of relations the serializer does not
+    read are dropped and the columns it does not read, or are not 'required', are deferred. The
+    annotations it does not read are no longer selected, though still usable for the ordering. The
+    queryset is returned as is when the serializer has opaque fields, see 'read_paths'.
+    """
+    aliases = {
+        lookup.prefetch_to: lookup.prefetch_through.split("__")[-1]
+        for lookup in queryset._prefetch_related_lookups
+        if isinstance(lookup, Prefetch)
+    }
+    paths = read_paths(serializer, queryset.model, aliases)
+    if paths is None:
+        return queryset
+    columns, relations, annotations = paths
+
+    selected = []
+    if isinstance(queryset.query.select_related, dict):
+        pending = [("", queryset.query.select_related)]
+        while pending:
+            prefix, tree = pending.pop()
+            for name, subtree in tree.items():
+                if prefix + name in relations:
+                    selected.append(prefix + name)
+                    pending.append((f"{prefix}{name}__", subtree))
+
+    prefetched = [
+        lookup
+        for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup) in relations
+    ]
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if selected:
+        queryset = queryset.select_related(*selected)
+    if prefetched:
+        queryset = queryset.prefetch_related(*prefetched)
+    queryset = queryset.only("pk", *columns, *required)
+
+    # Masked like 'alias()' does, the ordering may still refer to them
+    queryset.query.set_annotation_mask(
+        [name for name in queryset.query.annotation_select if name in annotations or name in required]
+    )
+    return queryset
+
+
+class QuerysetShape:
+    """Hashable stand-in for a queryset, equal for the querysets a serializer compiles the same for.
+
+    A compiled serializer only reads the model and the prefetches of its queryset, so querysets
+    of the same model with the same lookups, such as the clones a view's 'get_queryset' returns,
+    share it. A 'Prefetch' is compared by the identity of its queryset, which the shape holds.
+    """
+
+    __slots__ = ("queryset", "key")
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.key = (
+            queryset.model,
+            tuple(
+                (lookup.prefetch_through, lookup.prefetch_to, id(lookup.queryset))
+                if isinstance(lookup, Prefetch)
+                else lookup
+                for lookup in queryset._prefetch_related_lookups
+            ),
+        )
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, QuerysetShape) and self.key == other.key
+
+
+def compile_serializer(
+    serializer_class,
+    queryset,
+    fields: str = "",
+    expand: str = "",
+    required: tuple = (),
+) -> CompiledSerializer:
+    """Compile a serializer class once for the shape of a queryset, a sparse fieldset and the
+    columns required by the view.
+    """
+    return _compile_serializer(serializer_class, QuerysetShape(queryset), fields, expand, required)
+
+
+@lru_cache(maxsize=256)
+def _compile_serializer(serializer_class, shape: QuerysetShape, fields: str, expand: str, required: tuple):
+    serializer = serializer_class()
+    if fields:
+        select_fields(serializer, parse_field_paths(fields), parse_field_paths(expand))
+    return CompiledSerializer(serializer, shape.queryset, required=required)
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from pathlib import Path
 
 import dj_database_url
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "drf_yasg",  # Swagger for DRF
+    "app",  # Project-wide management commands
     "app.profiles",
     "app.chat",
 ]
@@ -93,6 +95,54 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": LIST_PER_PAGE,
 }
 
+# Chat: number of latest messages embedded in each thread, the full history is paginated
+THREAD_LATEST_MESSAGES = config("THREAD_LATEST_MESSAGES", cast=int, default=20)
+
+# Full-text search backend for messages (empty to pick one from the database vendor)
+MESSAGE_SEARCH_BACKEND = config("MESSAGE_SEARCH_BACKEND", default="")
+
+# Chat archive: days after which messages, and soft deleted messages, move to the archive table
+CHAT_ARCHIVE_AFTER_DAYS = config("CHAT_ARCHIVE_AFTER_DAYS", cast=int, default=365)
+CHAT_ARCHIVE_DELETED_AFTER_DAYS = config("CHAT_ARCHIVE_DELETED_AFTER_DAYS", cast=int, default=30)
+
+# Soft deletion: days soft deleted rows are kept for before being purged, per model, children first
+SOFT_DELETE_RETENTION_DAYS = {
+    "chat.Message": config("PURGE_MESSAGES_AFTER_DAYS", cast=int, default=90),
+    "chat.ArchivedMessage": config("PURGE_ARCHIVED_MESSAGES_AFTER_DAYS", cast=int, default=90),
+    "chat.ThreadParticipant": config("PURGE_THREAD_PARTICIPANTS_AFTER_DAYS", cast=int, default=90),
+    "chat.Thread": config("PURGE_THREADS_AFTER_DAYS", cast=int, default=90),
+    "profiles.Address": config("PURGE_ADDRESSES_AFTER_DAYS", cast=int, default=180),
+    "profiles.Profile": config("PURGE_PROFILES_AFTER_DAYS", cast=int, default=365),
+}
+
+# Chat bulk ingestion: maximum messages per batch
+CHAT_BULK_MESSAGES_MAX = config("CHAT_BULK_MESSAGES_MAX", cast=int, default=100)
+
+# Chat delta sync: maximum rows of each kind per response and how far behind the current time the
+# returned watermark is, so rows written by transactions still in flight are not skipped
+CHAT_SYNC_BATCH_SIZE = config("CHAT_SYNC_BATCH_SIZE", cast=int, default=500)
+CHAT_SYNC_GRACE_SECONDS = config("CHAT_SYNC_GRACE_SECONDS", cast=float, default=5.0)
+
+# Chat real-time events: pub/sub broker, events buffered per connection before dropping a slow
+# client and seconds between keepalive comments on idle streams
+CHAT_BROKER = config("CHAT_BROKER", default="app.chat.broker.InMemoryBroker")
+CHAT_EVENTS_QUEUE_SIZE = config("CHAT_EVENTS_QUEUE_SIZE", cast=int, default=100)
+CHAT_EVENTS_KEEPALIVE_SECONDS = config("CHAT_EVENTS_KEEPALIVE_SECONDS", cast=float, default=15.0)
+
+# Chat read receipts: seconds they are buffered for and pending participants written per UPDATE
+CHAT_READ_RECEIPTS_FLUSH_SECONDS = config("CHAT_READ_RECEIPTS_FLUSH_SECONDS", cast=float, default=2.0)
+CHAT_READ_RECEIPTS_BATCH_SIZE = config("CHAT_READ_RECEIPTS_BATCH_SIZE", cast=int, default=500)
+
+# Tasks Settings (geocoding runs in the background)
+TASKS = {
+    "default": {
+        "BACKEND": config("TASKS_BACKEND", default="app.task_backends.ThreadPoolBackend"),
+        "OPTIONS": {
+            "MAX_WORKERS": config("TASKS_MAX_WORKERS", cast=int, default=4),
+        },
+    },
+}
+
 # Health Check Settings
 HEALTH_CHECK = {
     "DISK_USAGE_MAX": 90,  # percent
@@ -157,6 +207,11 @@ DATABASES = {
     ),
 }
 
+# Background tasks and commands write to SQLite from several threads, so transactions take the write
+# lock upfront and wait for it instead of failing with "database is locked"
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"].setdefault("OPTIONS", {}).update(transaction_mode="IMMEDIATE", timeout=20)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -198,4 +253,57 @@ STATIC_URL = "static/"
 # Geocoding Settings
 NOMINATIM_ENDPOINT = "https://nominatim.openstreetmap.org"
 VIACEP_ENDPOINT = "https://viacep.com.br/ws"
+
+# Geocoding HTTP clients: shared connection pool, retries with exponential backoff and
+# rate limits in requests per second (Nominatim usage policy allows 1 req/s)
+GEOCODING_TIMEOUT = config("GEOCODING_TIMEOUT", cast=float, default=5.0)
+GEOCODING_POOL_SIZE = config("GEOCODING_POOL_SIZE", cast=int, default=10)
+GEOCODING_MAX_RETRIES = config("GEOCODING_MAX_RETRIES", cast=int, default=3)
+GEOCODING_BACKOFF_FACTOR = config("GEOCODING_BACKOFF_FACTOR", cast=float, default=1.0)
+NOMINATIM_RATE_LIMIT = config("NOMINATIM_RATE_LIMIT", cast=float, default=1.0)
+VIACEP_RATE_LIMIT = config("VIACEP_RATE_LIMIT", cast=float, default=10.0)
+
+# Geocoding circuit breaker: consecutive failures before failing fast and seconds before probing again
+GEOCODING_CIRCUIT_FAILURE_THRESHOLD = config("GEOCODING_CIRCUIT_FAILURE_THRESHOLD", cast=int, default=5)
+GEOCODING_CIRCUIT_RESET_TIMEOUT = config("GEOCODING_CIRCUIT_RESET_TIMEOUT", cast=float, default=30.0)
+
+# Retries of the 'geocode_address' task while the providers are unavailable: attempts and
+# seconds before the first retry, doubled on each attempt
+GEOCODING_TASK_MAX_ATTEMPTS = config("GEOCODING_TASK_MAX_ATTEMPTS", cast=int, default=5)
+GEOCODING_TASK_RETRY_DELAY = config("GEOCODING_TASK_RETRY_DELAY", cast=float, default=60.0)
+
+# Resolve CEPs only from the ZipCodeLookup table (cache and offline dataset), without HTTP fallback
+GEOCODING_OFFLINE = config("GEOCODING_OFFLINE", cast=bool, default=False)
+
+# CEP lookup cache, "Not Found" answers are cached for the negative TTL
+ZIP_CODE_LOOKUP_TTL = timedelta(days=config("ZIP_CODE_LOOKUP_TTL_DAYS", cast=int, default=90))
+ZIP_CODE_LOOKUP_NEGATIVE_TTL = timedelta(days=config("ZIP_CODE_LOOKUP_NEGATIVE_TTL_DAYS", cast=int, default=1))
 EARTH_RADIUS_KM = config("EARTH_RADIUS_KM", cast=float, default=6371.0088)
+
+# Spatial index backend for proximity searches (empty to pick one from the database vendor)
+SPATIAL_INDEX_BACKEND = config("SPATIAL_INDEX_BACKEND", default="")
+
+# k-nearest instructors search
+NEAREST_SEARCH_INITIAL_RADIUS_KM = config("NEAREST_SEARCH_INITIAL_RADIUS_KM", cast=float, default=1.0)
+NEAREST_SEARCH_MAX_K = 100
+
+# Cache backend. The default local memory cache is per process, so with several workers the
+# proximity search cache is only best-effort: an entry invalidated by one worker may still be
+# served by another until NEARBY_CACHE_TIMEOUT. Point it at a shared backend (e.g. Redis or
+# Memcached) to make invalidations visible to every worker.
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+# Proximity search cache: (radius bucket in km, geohash precision) pairs, smallest bucket first
+NEARBY_CACHE_BUCKETS = (
+    (1.0, 6),
+    (5.0, 5),
+    (10.0, 5),
+    (25.0, 4),
+    (50.0, 4),
+)
+NEARBY_CACHE_TIMEOUT = config("NEARBY_CACHE_TIMEOUT", cast=int, default=600)
@@ -0,0 +1,77 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Timer
+
+from django.db import close_old_connections
+from django.tasks.backends.base import BaseTaskBackend
+from django.tasks.base import TaskContext, TaskResult, TaskResultStatus
+from django.tasks.signals import task_enqueued
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPoolBackend(BaseTaskBackend):
+    """Task backend running tasks in a pool of background threads of the current process.
+
+    Enqueueing returns right away. Tasks are neither persisted nor shared between processes, and
+    their results cannot be retrieved: failures are only logged. Tasks deferred with 'run_after' wait
+    in a timer thread before being submitted to the pool. Pending tasks are lost on restart,
+    the statuses tracked on the models let them be resumed. Addresses left with a pending
+    geocoding status are resumed by the 'geocode_addresses' command, to be run after a restart
+    (e.g. on deploy).
+
+    Options:
+        MAX_WORKERS (int): Number of worker threads. Defaults to 4.
+    """
+
+    supports_async_task = True
+    supports_defer = True
+
+    def __init__(self, alias, params):
+        super().__init__(alias, params)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.options.get("MAX_WORKERS", 4),
+            thread_name_prefix=f"tasks-{alias}",
+        )
+
+    def _run_task(self, task_result: TaskResult):
+        task = task_result.task
+        args = (TaskContext(task_result=task_result), *task_result.args) if task.takes_context else task_result.args
+        try:
+            task.call(*args, **task_result.kwargs)
+        except Exception:
+            logger.exception("Task id=%s path=%s failed", task_result.id, task.module_path)
+        finally:
+            # Worker threads hold their own database connections
+            close_old_connections()
+
+    def enqueue(self, task, args, kwargs):
+        self.validate_task(task)
+
+        task_result = TaskResult(
+            task=task,
+            id=get_random_string(32),
+            status=TaskResultStatus.READY,
+            enqueued_at=timezone.now(),
+            started_at=None,
+            last_attempted_at=None,
+            finished_at=None,
+            args=args,
+            kwargs=kwargs,
+            backend=self.alias,
+            errors=[],
+            worker_ids=[],
+        )
+
+        delay = (task.run_after - timezone.now()).total_seconds() if task.run_after is not None else 0
+        if delay > 0:
+            timer = Timer(delay, self.executor.submit, (self._run_task, task_result))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.executor.submit(self._run_task, task_result)
+        task_enqueued.send(type(self), task_result=task_result)
+
+        return task_result
@@ -43,6 +43,7 @@ router.register(
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include(router.urls), name="api"),
+    path("api/events/", chat_views.events, name="events"),
 ]
 
 if settings.DEBUG:
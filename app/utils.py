@@ -1,18 +1,33 @@
 import math
 import uuid as _uuid
+from itertools import chain, islice
 
+import numpy as np
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, viewsets
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from unfold.admin import ModelAdmin
 from unfold.contrib.filters.admin import RangeDateFilter
 from unfold.decorators import display
 
+from app.renderers import FastJSONRenderer, StreamedItems
+from app.serializers import (
+    CompiledSerializer,
+    compile_serializer,
+    format_field_paths,
+    parse_field_paths,
+    select_fields,
+    shape_queryset,
+)
+
 
 # Abstract base classes for shared fields
 class TimestampedModel(models.Model):
@@ -25,14 +40,92 @@ class TimestampedModel(models.Model):
         abstract = True
 
 
+class SoftDeleteQuerySet(models.QuerySet):
+    """QuerySet of soft deletable models."""
+
+    def soft_delete(self) -> int:
+        """Soft delete every row of the queryset with a single UPDATE.
+
+        The UPDATE bypasses 'save', so the model's 'soft_deleted' hook then brings the state that
+        'save' maintains, e.g. denormalized counters and caches, up to date for the whole batch.
+
+        Returns:
+            int: Number of rows soft deleted.
+        """
+        now = timezone.now()
+        fields = {"deleted_at": now}
+        if any(field.name == "updated_at" for field in self.model._meta.concrete_fields):
+            fields["updated_at"] = now
+
+        with transaction.atomic():
+            pks = list(self.filter(deleted_at__isnull=True).select_for_update().values_list("pk", flat=True))
+            if pks:
+                self.model.all_objects.filter(pk__in=pks).update(**fields)
+                self.model.soft_deleted(pks)
+        return len(pks)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """Default manager of soft deletable models, excluding the soft deleted rows."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class SoftDeleteModel(models.Model):
-    """Abstract base class that provides a 'deleted_at' field for soft deletion."""
+    """Abstract base class that provides a 'deleted_at' field for soft deletion.
+
+    'objects' only returns the rows not soft deleted, 'all_objects' returns every row.
+
+    Unique constraints are made partial on 'deleted_at IS NULL', so that soft deleted rows free
+    their values. One-to-one relations cannot be, so a new row whose 'undelete_on' fields match
+    a soft deleted row takes that row over instead of being inserted.
+    """
 
     deleted_at = models.DateTimeField(verbose_name="deletado em", blank=True, null=True)
 
+    objects = SoftDeleteManager()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
+    # Names of the unique fields, e.g. one-to-one relations, whose soft deleted row is undeleted
+    undelete_on = ()
+
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.undelete_on and self.take_over_deleted_row():
+            kwargs["force_insert"] = False
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def soft_deleted(cls, pks: list) -> None:
+        """Hook called by 'SoftDeleteQuerySet.soft_delete' once rows were soft deleted in bulk.
+
+        Models whose 'save' has side effects on soft deletion override it to apply them to the batch.
+
+        Args:
+            pks (list): Primary keys of the rows just soft deleted.
+        """
+
+    def take_over_deleted_row(self) -> bool:
+        """Point a new object to the soft deleted row holding the same 'undelete_on' values, if any.
+
+        Returns:
+            bool: Whether a soft deleted row was taken over, the object is then saved as an UPDATE.
+        """
+        lookup = {name: getattr(self, self._meta.get_field(name).attname) for name in self.undelete_on}
+        pk = type(self).all_objects.filter(deleted_at__isnull=False, **lookup).values_list("pk", flat=True).first()
+        if pk is None:
+            return False
+
+        self.pk = pk
+        self._state.adding = False
+        if getattr(self, "created_at", False) is None:
+            # 'auto_now_add' is only applied on inserts
+            self.created_at = timezone.now()
+        return True
+
     def delete(self, *args, **kwargs):
         """Soft delete the object by setting 'deleted_at' timestamp instead of deleting from the database."""
         self.deleted_at = timezone.now()
@@ -52,6 +145,16 @@ class BaseAdmin(ModelAdmin):
 
     readonly_fields = ("created_at", "updated_at", "deleted_at")
 
+    def get_queryset(self, request):
+        # Soft deleted rows stay reachable from the admin, through the 'deleted_at' filter
+        if not hasattr(self.model, "all_objects"):
+            return super().get_queryset(request)
+
+        qs = self.model.all_objects.get_queryset()
+        if ordering := self.get_ordering(request):
+            qs = qs.order_by(*ordering)
+        return qs
+
     @display(description="")
     def see_more(self, obj):
         return mark_safe('<span class="material-symbols-outlined">visibility</span>')
@@ -117,6 +220,102 @@ class BaseModelViewSet(LookupIdOrUuidMixin, viewsets.ModelViewSet):
     ordering_fields = "__all__"
     ordering = ["-created_at"]
 
+    # The fast renderer is only used when asked for, the default one stays first
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, FastJSONRenderer]
+
+    # Serialize the list action from rows instead of model instances, see 'CompiledSerializer'
+    compile_list_serializer = False
+
+    def get_compiled_serializer(self) -> CompiledSerializer | None:
+        """Compiled serializer of the list action, None when the view does not compile it."""
+        if not self.compile_list_serializer or self.action != "list":
+            return None
+        return compile_serializer(
+            self.get_serializer_class(),
+            self.get_queryset(),
+            *self.get_sparse_fieldset(),
+            required=self.get_required_fields(),
+        )
+
+    def get_required_fields(self) -> tuple:
+        """Model fields read from the listed objects besides the serialized ones, by the pagination."""
+        return tuple(getattr(self.paginator, "required_fields", ()))
+
+    def get_sparse_fieldset(self) -> tuple[str, str]:
+        """'fields' and 'expand' query params of the read actions, normalized by 'format_field_paths'
+        so that equivalent lists share their compiled serializer, empty strings without 'fields'.
+
+        'fields' lists the comma separated fields to return, dotted for the fields of nested
+        serializers, which are otherwise returned without their own nested serializers. 'expand'
+        lists the nested serializers to return whole, or down to the nested serializers listed.
+        """
+        request = getattr(self, "request", None)
+        if request is None or self.action not in ("list", "retrieve"):
+            return "", ""
+        # A list of empty paths, such as 'fields=,', selects nothing and is ignored like no list
+        if not (fields := format_field_paths(parse_field_paths(request.query_params.get("fields", "")))):
+            return "", ""
+        return fields, format_field_paths(parse_field_paths(request.query_params.get("expand", "")))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields, expand = self.get_sparse_fieldset()
+        if fields:
+            select_fields(getattr(serializer, "child", serializer), parse_field_paths(fields), parse_field_paths(expand))
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Relations and columns left out of a sparse fieldset are not read
+        if self.get_sparse_fieldset()[0]:
+            queryset = shape_queryset(queryset, self.get_serializer(), self.get_required_fields())
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """List objects, streaming the response in chunks when the fast renderer is accepted."""
+        renderer = getattr(request, "accepted_renderer", None)
+        streamed = isinstance(renderer, FastJSONRenderer)
+        compiled = self.get_compiled_serializer()
+        if not streamed and compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if compiled is not None:
+            queryset = compiled.rows(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            objects = page
+        elif isinstance(queryset, models.QuerySet):
+            objects = queryset.iterator(chunk_size=CompiledSerializer.batch_size)
+        else:
+            objects = queryset
+
+        # Each object is serialized only when it is written
+        if compiled is not None:
+            items = compiled.serialize(objects)
+        else:
+            child = self.get_serializer(many=True).child
+            items = (child.to_representation(obj) for obj in objects)
+
+        if not streamed:
+            items = list(items)
+            return self.get_paginated_response(items) if page is not None else Response(items)
+
+        # The first chunk is serialized before the response is committed to, so that its errors
+        # still turn into a regular error response
+        items = iter(items)
+        head = list(islice(items, renderer.chunk_size))
+        items = StreamedItems(chain(head, items))
+        response = self.get_paginated_response(items) if page is not None else Response(items)
+        streaming = StreamingHttpResponse(
+            renderer.stream(response.data, request.accepted_media_type),
+            status=response.status_code,
+            content_type=renderer.media_type,
+        )
+        for header, value in response.items():
+            streaming.setdefault(header, value)
+        return streaming
+
 
 # ==============================================================================
 
@@ -145,6 +344,29 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return settings.EARTH_RADIUS_KM * c
 
 
+def haversine_km_many(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Calculate the great-circle distances from one point to many points in a single vectorized pass.
+
+    Args:
+        lat (float): Latitude of the origin point in decimal degrees.
+        lon (float): Longitude of the origin point in decimal degrees.
+        lats (np.ndarray): Latitudes of the target points in decimal degrees.
+        lons (np.ndarray): Longitudes of the target points in decimal degrees.
+
+    Returns:
+        np.ndarray: Distances from the origin to each target point in kilometers.
+    """
+    # Convert decimal degrees to radians
+    phi1, phi2 = math.radians(lat), np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lons) - math.radians(lon)
+
+    # Haversine formula
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return settings.EARTH_RADIUS_KM * c
+
+
 def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
     """Pre-filtering bounding box for a given point and radius.
 
@@ -162,6 +384,108 @@ def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float
     return (lat - lat_delta, lat + lat_delta, lon - lon_delta, lon + lon_delta)
 
 
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_steps(precision: int) -> tuple[float, float]:
+    """Size of a geohash cell for a given precision.
+
+    Args:
+        precision (int): Number of characters of the geohash.
+
+    Returns:
+        tuple[float, float]: Cell height and width in decimal degrees.
+    """
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    """Encode a point into a geohash.
+
+    Args:
+        lat (float): Latitude of the point in decimal degrees.
+        lon (float): Longitude of the point in decimal degrees.
+        precision (int): Number of characters of the geohash.
+
+    Returns:
+        str: Geohash of the cell containing the point.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+
+    while len(chars) < precision:
+        # Bits alternate between longitude (even) and latitude (odd)
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+
+    return "".join(chars)
+
+
+def geohash_center(geohash: str) -> tuple[float, float]:
+    """Decode a geohash into the center of its cell.
+
+    Args:
+        geohash (str): Geohash to be decoded.
+
+    Returns:
+        tuple[float, float]: Latitude and longitude of the cell center in decimal degrees.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def geohash_cover(min_lat: float, max_lat: float, min_lon: float, max_lon: float, precision: int) -> set[str]:
+    """Geohashes of all cells intersecting a bounding box.
+
+    Args:
+        min_lat (float): Minimum latitude of the box in decimal degrees.
+        max_lat (float): Maximum latitude of the box in decimal degrees.
+        min_lon (float): Minimum longitude of the box in decimal degrees.
+        max_lon (float): Maximum longitude of the box in decimal degrees.
+        precision (int): Number of characters of the geohashes.
+
+    Returns:
+        set[str]: Geohashes of the cells intersecting the box.
+    """
+    lat_step, lon_step = geohash_steps(precision)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0 - lat_step / 2)
+    min_lon, max_lon = max(min_lon, -180.0), min(max_lon, 180.0 - lon_step / 2)
+
+    cells = set()
+    for i in range(math.floor((min_lat + 90) / lat_step), math.floor((max_lat + 90) / lat_step) + 1):
+        for j in range(math.floor((min_lon + 180) / lon_step), math.floor((max_lon + 180) / lon_step) + 1):
+            # Encode the center of each cell of the grid
+            cells.add(geohash_encode(-90 + (i + 0.5) * lat_step, -180 + (j + 0.5) * lon_step, precision))
+    return cells
+
+
 # ==============================================================================
 
 